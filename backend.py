@@ -0,0 +1,243 @@
+import asyncio
+import functools
+import random
+import time
+
+import httpx
+
+import metrics
+from cache import TTLCache
+from utils import API_URL, BACKEND_TIMEOUT, BACKEND_MAX_CONNECTIONS, BACKEND_MAX_KEEPALIVE, BACKEND_MAX_CONCURRENCY, \
+    BACKEND_GET_RETRIES, BACKEND_RETRY_BACKOFF, BACKEND_MAX_IN_FLIGHT, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT, \
+    BACKEND_STALE_CACHE_SIZE, BACKEND_STALE_TTL, BACKEND_DEDUPES_IDEMPOTENCY_KEYS
+
+# Per-endpoint timeouts in seconds; endpoints not listed here use BACKEND_TIMEOUT
+ENDPOINT_TIMEOUTS = {
+    "/user/exist": 3.0,
+    "/user/info": 5.0,
+    "/user/orders": 5.0,
+    "/orders/list": 5.0,
+    "/user/createAccount/": 15.0,
+    "/user/recoverPassword/": 15.0,
+    "/order/create": 10.0,
+    "/order/delete": 10.0,
+    "/orders/buy": 10.0,
+}
+
+_client = None
+_semaphore = None
+# Requests currently waiting for or holding a connection slot, used for load shedding
+_pending_requests = 0
+
+# (path, params) -> last successful GET response, served while the backend is unavailable
+_last_good = TTLCache(maxsize=BACKEND_STALE_CACHE_SIZE, ttl=BACKEND_STALE_TTL)
+
+# (path, params) -> task of the identical GET currently in flight
+_in_flight = {}
+# Number of GETs sent to the backend and of GETs that joined an identical in-flight request instead
+single_flight_stats = {"sent": 0, "collapsed": 0}
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared keep-alive client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=API_URL or "",
+            timeout=BACKEND_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=BACKEND_MAX_CONNECTIONS,
+                max_keepalive_connections=BACKEND_MAX_KEEPALIVE,
+            ),
+        )
+    return _client
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one backend endpoint.
+
+    After failure_threshold failures in a row the circuit opens and calls fail fast. Once
+    reset_timeout seconds have passed a single trial call is let through: success closes the
+    circuit, failure keeps it open for another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """Return whether a call may be made now."""
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at < self.reset_timeout or self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def abandon_trial(self) -> None:
+        """Let another trial call through once the current one ended without an outcome, e.g. was cancelled."""
+        self._trial_running = False
+
+
+# path -> CircuitBreaker
+breakers = {}
+
+
+def is_stale(response: httpx.Response) -> bool:
+    """Whether the response is last-known-good data served because the backend was unavailable."""
+    return response.extensions.get("stale", False)
+
+
+def _fallback(method: str, path: str, key, status_code: int) -> httpx.Response:
+    """Serve the last successful response for the request, or a synthetic error response."""
+    cached = _last_good.get(key) if key is not None else None
+    if cached is not None:
+        metrics.increment("backend_stale_responses_total", endpoint=path)
+        # content is already decoded and may differ in length, so the headers describing the body must go
+        headers = [
+            (name, value) for name, value in cached.headers.multi_items()
+            if name not in ("content-encoding", "content-length")
+        ]
+        return httpx.Response(
+            cached.status_code, headers=headers, content=cached.content, request=cached.request,
+            extensions={"stale": True},
+        )
+    return httpx.Response(status_code, request=httpx.Request(method, f"{API_URL or ''}{path}"))
+
+
+async def _send(method: str, path: str, params: dict, json: dict, headers: dict) -> httpx.Response:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(BACKEND_MAX_CONCURRENCY)
+
+    timeout = ENDPOINT_TIMEOUTS.get(path, BACKEND_TIMEOUT)
+    async with _semaphore:
+        with metrics.timer("backend_request_seconds", method=method, endpoint=path):
+            try:
+                response = await get_client().request(
+                    method, path, params=params, json=json, headers=headers, timeout=timeout
+                )
+            except httpx.HTTPError:
+                metrics.increment("backend_responses_total", method=method, endpoint=path, status="error")
+                raise
+    metrics.increment("backend_responses_total", method=method, endpoint=path, status=response.status_code)
+    return response
+
+
+async def request(method: str, path: str, params: dict = None, json: dict = None,
+                  idempotency_key: str = None) -> httpx.Response:
+    """Send a request to the backend without blocking the event loop.
+
+    GETs are retried with jittered exponential backoff. Other requests are sent once, as a timeout
+    or 5xx leaves open whether the backend applied them: an idempotency key is sent along as the
+    Idempotency-Key header, and only with BACKEND_DEDUPES_IDEMPOTENCY_KEYS set, declaring that the
+    backend applies a repeated key once, are requests carrying one retried too.
+    Transport failures never raise: while an endpoint's circuit is open, the request budget is
+    exhausted or retries are used up, GETs get their last successful response (see is_stale) and
+    other requests a synthetic 503/504 response.
+
+    Once any other request has been answered, GETs already in flight are no longer shared, so
+    reads made after a change never get a response that may predate it.
+    """
+    global _pending_requests
+    breaker = breakers.setdefault(path, CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT))
+    key = (path, tuple(sorted((params or {}).items()))) if method == "GET" else None
+
+    if _pending_requests >= BACKEND_MAX_IN_FLIGHT:
+        metrics.increment("backend_shed_requests_total", endpoint=path)
+        return _fallback(method, path, key, 503)
+    if not breaker.allow():
+        metrics.increment("backend_circuit_rejections_total", endpoint=path)
+        return _fallback(method, path, key, 503)
+    is_trial = breaker.is_open()
+
+    headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+    retried = method == "GET" or (idempotency_key is not None and BACKEND_DEDUPES_IDEMPOTENCY_KEYS)
+    attempts = 1 + (BACKEND_GET_RETRIES if retried else 0)
+    status_code = 503
+    _pending_requests += 1
+    try:
+        for attempt in range(attempts):
+            if attempt:
+                await asyncio.sleep(BACKEND_RETRY_BACKOFF * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+            try:
+                response = await _send(method, path, params, json, headers)
+            except httpx.TimeoutException:
+                status_code = 504
+            except httpx.TransportError:
+                status_code = 503
+            else:
+                if response.status_code < 500:
+                    breaker.record_success()
+                    if key is not None and response.status_code == 200:
+                        _last_good.set(key, response)
+                    return response
+                status_code = response.status_code
+
+            breaker.record_failure()
+            if breaker.is_open():
+                break
+    finally:
+        _pending_requests -= 1
+        if is_trial:
+            breaker.abandon_trial()
+        if method != "GET":
+            _in_flight.clear()
+
+    return _fallback(method, path, key, status_code)
+
+
+async def get(path: str, params: dict = None) -> httpx.Response:
+    """Send a GET request, sharing the response with identical GETs already in flight."""
+    key = (path, tuple(sorted((params or {}).items())))
+    task = _in_flight.get(key)
+    if task is None:
+        single_flight_stats["sent"] += 1
+        task = asyncio.ensure_future(request("GET", path, params=params))
+        _in_flight[key] = task
+        task.add_done_callback(functools.partial(_forget_in_flight, key))
+    else:
+        single_flight_stats["collapsed"] += 1
+
+    # Shield the shared request so one cancelled caller doesn't cancel it for the others
+    return await asyncio.shield(task)
+
+
+def _forget_in_flight(key, task: asyncio.Future) -> None:
+    # A mutation may have detached this task and a newer GET taken its place
+    if _in_flight.get(key) is task:
+        del _in_flight[key]
+
+
+async def post(path: str, json: dict = None, idempotency_key: str = None) -> httpx.Response:
+    return await request("POST", path, json=json, idempotency_key=idempotency_key)
+
+
+async def delete(path: str, params: dict = None, idempotency_key: str = None) -> httpx.Response:
+    return await request("DELETE", path, params=params, idempotency_key=idempotency_key)
+
+
+async def close() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,72 @@
+import asyncio
+
+import backend
+
+# Status codes meaning the backend has no such batch endpoint
+_MISSING_ENDPOINT_STATUSES = {404, 405, 501}
+
+# Batch endpoints found missing; requests for them go straight to the per-order fallback
+_unsupported = set()
+
+
+async def _post_batch(path: str, payload: dict):
+    """POST to a batch endpoint, returning its per-order results or None if the endpoint does not exist.
+
+    A batch endpoint answers with a list of ``{"order_id": ..., "success": ...}`` objects.
+    """
+    if path in _unsupported:
+        return None
+
+    response = await backend.post(path, json=payload)
+    if response.status_code in _MISSING_ENDPOINT_STATUSES:
+        _unsupported.add(path)
+        return None
+    if response.status_code != 200:
+        return {}
+    return {result["order_id"]: result for result in response.json()}
+
+
+async def delete_orders(user_id: int, order_ids: list) -> dict:
+    """Delete several orders, returning order_id -> whether it was deleted."""
+    results = await _post_batch("/orders/delete/batch", {"user_id": user_id, "order_ids": order_ids})
+    if results is not None:
+        return {order_id: bool(results.get(order_id, {}).get("success")) for order_id in order_ids}
+
+    responses = await asyncio.gather(
+        *(backend.delete("/order/delete", params={"order_id": order_id, "user_id": user_id}) for order_id in order_ids)
+    )
+    return {order_id: response.status_code == 200 for order_id, response in zip(order_ids, responses)}
+
+
+async def buy_orders(user_id: int, amounts: dict) -> dict:
+    """Buy from several orders, given order_id -> amount_to_buy.
+
+    Returns order_id -> the purchase result (with 'amount_to_receive' and 'amount_paid'), or None
+    for orders that could not be bought. The batch endpoint need not report the amounts, in which
+    case both are None.
+    """
+    order_ids = list(amounts)
+    results = await _post_batch(
+        "/orders/buy/batch",
+        {
+            "user_id": user_id,
+            "orders": [{"order_id": order_id, "amount_to_buy": amount} for order_id, amount in amounts.items()],
+        },
+    )
+    if results is not None:
+        return {
+            order_id: {"amount_to_receive": None, "amount_paid": None, **results[order_id]}
+            if results.get(order_id, {}).get("success") else None
+            for order_id in order_ids
+        }
+
+    responses = await asyncio.gather(
+        *(
+            backend.post("/orders/buy", json={"user_id": user_id, "order_id": order_id, "amount_to_buy": amount})
+            for order_id, amount in amounts.items()
+        )
+    )
+    return {
+        order_id: response.json() if response.status_code == 200 else None
+        for order_id, response in zip(order_ids, responses)
+    }
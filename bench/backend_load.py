@@ -0,0 +1,69 @@
+"""Load test: concurrent update throughput with blocking vs. async backend calls.
+
+Each simulated update does what get_user_info does: one /user/info call to a local fake backend
+with a fixed latency. The blocking variant issues the call with a synchronous client from inside
+the coroutine, as the handlers did with ``requests``; the async variant goes through backend.py.
+
+    python -m bench.backend_load --updates 200 --latency 0.05 --concurrency 1,10,100
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+import backend
+from bench.fake_backend import FakeBackend
+from bench.http_stub import InThread
+from bench.report import latency_summary
+
+
+async def run(handle_update, updates: int, concurrency: int):
+    """Process the updates with at most ``concurrency`` in flight, returning (updates/s, latencies)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def process(user_id: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await handle_update(user_id)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(process(user_id) for user_id in range(updates)))
+    return updates / (time.perf_counter() - started), latencies
+
+
+async def main(args) -> None:
+    fake = FakeBackend(latency=args.latency)
+    for user_id in range(args.updates):
+        fake.add_user(user_id)
+
+    with InThread(fake):
+        backend.API_URL = fake.url
+        blocking_client = httpx.Client(base_url=fake.url)
+
+        async def blocking_update(user_id: int) -> None:
+            blocking_client.get("/user/info", params={"user_id": user_id}).raise_for_status()
+
+        async def async_update(user_id: int) -> None:
+            (await backend.get("/user/info", params={"user_id": user_id})).raise_for_status()
+
+        print(f"{args.updates} updates, backend latency {args.latency * 1000:.0f} ms")
+        for concurrency in args.concurrency:
+            for name, handle_update in (("blocking", blocking_update), ("async", async_update)):
+                throughput, latencies = await run(handle_update, args.updates, concurrency)
+                print(f"  {name:8} concurrency={concurrency:<4} {throughput:9.1f} updates/s  {latency_summary(latencies)}")
+
+        blocking_client.close()
+        await backend.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="backend latency in seconds")
+    parser.add_argument(
+        "--concurrency", type=lambda value: [int(part) for part in value.split(",")], default=[1, 10, 100]
+    )
+    asyncio.run(main(parser.parse_args()))
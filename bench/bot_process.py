@@ -0,0 +1,75 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+
+# Repository root, where main.py lives
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Rate limits lifted so the bot's own scheduler isn't what a benchmark measures
+UNLIMITED_RATES = {
+    "TELEGRAM_GLOBAL_RATE": "100000",
+    "TELEGRAM_CHAT_RATE": "100000",
+    "TELEGRAM_CHAT_BURST": "100000",
+}
+
+
+class BotProcess:
+    """Run ``python main.py`` against a fake Bot API and fake backend.
+
+    ``env`` overrides the bot's configuration (see utils.py); it takes precedence over .env.
+    """
+
+    def __init__(self, telegram_url: str, backend_url: str, env: dict = None):
+        self.env = {
+            **os.environ,
+            "TELEGRAM_TOKEN": "123456:fake",
+            "TELEGRAM_API_URL": telegram_url,
+            "API_URL": backend_url,
+            "PYTHONUNBUFFERED": "1",
+            **(env or {}),
+        }
+        self.process = None
+
+    def start(self) -> None:
+        self.process = subprocess.Popen([sys.executable, "main.py"], cwd=ROOT, env=self.env)
+
+    def stop(self) -> None:
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def peak_memory(self) -> int:
+        """Peak resident memory in bytes of the bot and its worker processes so far (Linux only)."""
+        total = 0
+        for pid in [self.process.pid, *_children(self.process.pid)]:
+            try:
+                with open(f"/proc/{pid}/status") as status:
+                    for line in status:
+                        if line.startswith("VmHWM:"):
+                            total += int(line.split()[1]) * 1024
+            except OSError:
+                pass
+        return total
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        # The fakes run on the caller's event loop and must keep answering while the bot shuts down
+        await asyncio.to_thread(self.stop)
+
+
+def _children(pid: int) -> list:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
@@ -0,0 +1,67 @@
+"""Micro-benchmark: per-update cost of finding the handler for a button press.
+
+Compares one regex CallbackQueryHandler per action, tried in order as the application does,
+with the CallbackRouter's single table lookup, as the number of actions grows. Presses are
+spread evenly over the actions and carry an order id, like "delete_order_42" / "do:42".
+
+    python -m bench.callback_dispatch --actions 10,25,50,100,200 --presses 20000
+"""
+import argparse
+import time
+
+from telegram.ext import CallbackQueryHandler
+
+import callbacks
+from bench.updates import callback_update
+from callbacks import CallbackRouter
+
+
+async def noop(update, context) -> None:
+    pass
+
+
+def regex_setup(actions: int) -> tuple:
+    handlers = [CallbackQueryHandler(noop, pattern=rf"^action{n}_\d+$") for n in range(actions)]
+    updates = [callback_update(n, 1, f"action{n % actions}_{n}") for n in range(actions * 10)]
+    return handlers, updates
+
+
+def router_setup(actions: int) -> tuple:
+    # Synthetic action codes, registered like the real ones in callbacks.ARGUMENT_TYPES
+    codes = [f"z{n}" for n in range(actions)]
+    callbacks.ARGUMENT_TYPES.update({code: (int,) for code in codes})
+    router = CallbackRouter({code: noop for code in codes})
+    updates = [callback_update(n, 1, callbacks.encode(codes[n % actions], n)) for n in range(actions * 10)]
+    return [router], updates
+
+
+def per_update(handlers: list, updates: list, presses: int) -> float:
+    """Seconds to find the matching handler for one update, best of three runs."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for n in range(presses):
+            update = updates[n % len(updates)]
+            for handler in handlers:
+                if handler.check_update(update):
+                    break
+            else:
+                raise AssertionError(f"no handler for {update.callback_query.data}")
+        best = min(best, time.perf_counter() - started)
+    return best / presses
+
+
+def main(args) -> None:
+    print(f"{'actions':>8} {'regex handlers':>16} {'router':>10}")
+    for actions in args.actions:
+        regex = per_update(*regex_setup(actions), args.presses)
+        router = per_update(*router_setup(actions), args.presses)
+        print(f"{actions:8} {regex * 1e6:13.2f} µs {router * 1e6:7.2f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--actions", type=lambda value: [int(part) for part in value.split(",")],
+                        default=[10, 25, 50, 100, 200])
+    parser.add_argument("--presses", type=int, default=20000)
+    main(parser.parse_args())
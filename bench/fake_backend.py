@@ -0,0 +1,256 @@
+import asyncio
+import gzip
+import itertools
+import time
+from collections import Counter, deque
+
+from bench.http_stub import StubServer, DropConnection, Response, json_response
+
+# Wallets every new account starts with
+STARTING_WALLETS = {"BTC": 10.0, "ETH": 100.0, "USDT": 100000.0}
+
+
+class FakeBackend:
+    """In-memory stand-in for the exchange backend at API_URL, served over local HTTP.
+
+    It implements the endpoints handlers.py calls with the same request and response shapes.
+    ``latency`` seconds are added to every request. Faults can be queued per path with inject(),
+    every request is counted in ``requests`` and the Idempotency-Key header is honoured only when
+    ``dedupe_idempotency_keys`` is set, like a backend that supports it. ``expose_owner`` adds
+    each order's user_id to /orders/list items, ``batch_endpoints`` serves the bulk endpoints and
+    ``gzip`` compresses response bodies.
+    """
+
+    def __init__(self, latency: float = 0.0, expose_owner: bool = False, batch_endpoints: bool = False,
+                 gzip: bool = False, dedupe_idempotency_keys: bool = False):
+        self.latency = latency
+        self.expose_owner = expose_owner
+        self.batch_endpoints = batch_endpoints
+        self.gzip = gzip
+        self.dedupe_idempotency_keys = dedupe_idempotency_keys
+        self.requests = Counter()
+        # user_id -> {"password", "address", "wallets": {currency: value}}
+        self.users = {}
+        # order_id -> order as stored, including user_id and updated_at
+        self.orders = {}
+        self._order_ids = itertools.count(1)
+        self._faults = {}
+        self._idempotent_responses = {}
+        self._server = StubServer(self._handle)
+        self._routes = {
+            ("GET", "/user/exist"): self._user_exist,
+            ("POST", "/user/createAccount/"): self._create_account,
+            ("POST", "/user/recoverPassword/"): self._recover_password,
+            ("GET", "/user/info"): self._user_info,
+            ("GET", "/user/orders"): self._user_orders,
+            ("GET", "/orders/list"): self._orders_list,
+            ("POST", "/order/create"): self._create_order,
+            ("DELETE", "/order/delete"): self._delete_order,
+            ("POST", "/orders/buy"): self._buy,
+            ("POST", "/orders/delete/batch"): self._delete_batch,
+            ("POST", "/orders/buy/batch"): self._buy_batch,
+        }
+
+    @property
+    def url(self) -> str:
+        return self._server.url
+
+    async def start(self) -> None:
+        await self._server.start()
+
+    async def close(self) -> None:
+        await self._server.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def inject(self, path: str, status: int = None, delay: float = None, drop: bool = False, times: int = 1) -> None:
+        """Make the next ``times`` requests to path fail: answer with status, stall for delay seconds
+        before answering normally, or drop the connection."""
+        self._faults.setdefault(path, deque()).extend([(status, delay, drop)] * times)
+
+    def add_user(self, user_id: int, wallets: dict = None) -> None:
+        self.users[user_id] = {
+            "password": "secret",
+            "address": f"0x{user_id:040x}",
+            "wallets": dict(STARTING_WALLETS if wallets is None else wallets),
+        }
+
+    def add_order(self, user_id: int, from_currency: str, to_currency: str, value: float, exchange_rate: float) -> int:
+        order_id = next(self._order_ids)
+        self.orders[order_id] = {
+            "order_id": order_id,
+            "user_id": user_id,
+            "from_currency": from_currency,
+            "to_currency": to_currency,
+            "amount_sold": value,
+            "amount_to_receive": value * exchange_rate,
+            "status": "open",
+            "updated_at": time.time(),
+        }
+        return order_id
+
+    # Serving
+
+    async def _handle(self, request) -> Response:
+        self.requests[(request.method, request.path)] += 1
+        faults = self._faults.get(request.path)
+        status, delay, drop = faults.popleft() if faults else (None, None, False)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if delay:
+            await asyncio.sleep(delay)
+        if drop:
+            raise DropConnection
+        if status is not None:
+            return json_response({"detail": "injected fault"}, status)
+
+        route = self._routes.get((request.method, request.path))
+        if route is None or (not self.batch_endpoints and request.path.endswith("/batch")):
+            return json_response({"detail": "Not Found"}, 404)
+
+        key = request.headers.get("idempotency-key") if self.dedupe_idempotency_keys else None
+        if key is not None and key in self._idempotent_responses:
+            response = self._idempotent_responses[key]
+        else:
+            response = route(request)
+            if key is not None:
+                self._idempotent_responses[key] = response
+
+        if self.gzip:
+            return Response(
+                response.status, gzip.compress(response.body), {**response.headers, "Content-Encoding": "gzip"}
+            )
+        return response
+
+    def _public(self, order: dict, with_owner: bool) -> dict:
+        fields = ("order_id", "from_currency", "to_currency", "amount_sold", "amount_to_receive", "status")
+        public = {field: order[field] for field in fields}
+        if with_owner:
+            public["user_id"] = order["user_id"]
+        return public
+
+    def _user_exist(self, request) -> Response:
+        return json_response({"exists": int(request.query["user_id"]) in self.users})
+
+    def _create_account(self, request) -> Response:
+        data = request.json()
+        if data["user_id"] in self.users:
+            return json_response({"detail": "User already exists"}, 400)
+        self.add_user(data["user_id"])
+        self.users[data["user_id"]]["password"] = data["password"]
+        return json_response({
+            "mnemonic_phrase": [f"word{i}" for i in range(12)],
+            "user_address": self.users[data["user_id"]]["address"],
+        })
+
+    def _recover_password(self, request) -> Response:
+        data = request.json()
+        user = self.users.get(data["user_id"])
+        if user is None:
+            return json_response({"detail": "User not found"}, 404)
+        user["password"] = data["new_password"]
+        return json_response({"msg": "Password updated"})
+
+    def _user_info(self, request) -> Response:
+        user = self.users.get(int(request.query["user_id"]))
+        if user is None:
+            return json_response({"detail": "User not found"}, 404)
+        return json_response({
+            "user_address": user["address"],
+            "wallets": [{"currency": currency, "value": value} for currency, value in user["wallets"].items()],
+        })
+
+    def _user_orders(self, request) -> Response:
+        user_id = int(request.query["user_id"])
+        since = float(request.query.get("updated_since", 0))
+        return json_response([
+            self._public(order, with_owner=False) for order in self.orders.values()
+            if order["user_id"] == user_id and order["updated_at"] >= since and order["status"] != "deleted"
+        ])
+
+    def _orders_list(self, request) -> Response:
+        buy, sell = request.query["currency_to_buy"], request.query["currency_to_sell"]
+        viewer = int(request.query["user_id"]) if "user_id" in request.query else None
+        return json_response([
+            self._public(order, with_owner=self.expose_owner) for order in self.orders.values()
+            if order["from_currency"] == buy and order["to_currency"] == sell and order["status"] == "open"
+            and order["user_id"] != viewer
+        ])
+
+    def _create_order(self, request) -> Response:
+        data = request.json()
+        user = self.users.get(data["user_id"])
+        if user is None or user["wallets"].get(data["from_currency"], 0) < data["value"]:
+            return json_response({"detail": "Insufficient funds"}, 400)
+        user["wallets"][data["from_currency"]] -= data["value"]
+        order_id = self.add_order(
+            data["user_id"], data["from_currency"], data["to_currency"], data["value"], data["exchange_rate"]
+        )
+        return json_response({"msg": f"Order {order_id} created"})
+
+    def _remove_order(self, user_id: int, order_id: int) -> bool:
+        order = self.orders.get(order_id)
+        if order is None or order["user_id"] != user_id or order["status"] != "open":
+            return False
+        order["status"] = "deleted"
+        order["updated_at"] = time.time()
+        wallets = self.users[user_id]["wallets"]
+        wallets[order["from_currency"]] = wallets.get(order["from_currency"], 0) + order["amount_sold"]
+        return True
+
+    def _delete_order(self, request) -> Response:
+        if not self._remove_order(int(request.query["user_id"]), int(request.query["order_id"])):
+            return json_response({"detail": "Order not found"}, 404)
+        return json_response({"msg": "Order deleted"})
+
+    def _fill(self, user_id: int, order_id: int, amount_to_buy: float):
+        """Buy from an order, returning the /orders/buy response body or None if the purchase is invalid."""
+        order = self.orders.get(order_id)
+        buyer = self.users.get(user_id)
+        if order is None or buyer is None or order["status"] != "open" or order["user_id"] == user_id:
+            return None
+        if amount_to_buy > order["amount_sold"]:
+            return None
+        rate = order["amount_to_receive"] / order["amount_sold"]
+        amount_paid = amount_to_buy * rate
+        if buyer["wallets"].get(order["to_currency"], 0) < amount_paid:
+            return None
+
+        buyer["wallets"][order["to_currency"]] -= amount_paid
+        buyer["wallets"][order["from_currency"]] = buyer["wallets"].get(order["from_currency"], 0) + amount_to_buy
+        seller = self.users[order["user_id"]]["wallets"]
+        seller[order["to_currency"]] = seller.get(order["to_currency"], 0) + amount_paid
+
+        order["amount_sold"] -= amount_to_buy
+        order["amount_to_receive"] -= amount_paid
+        order["status"] = "filled" if order["amount_sold"] <= 0 else "open"
+        order["updated_at"] = time.time()
+        return {"amount_to_receive": amount_to_buy, "amount_paid": amount_paid}
+
+    def _buy(self, request) -> Response:
+        data = request.json()
+        result = self._fill(data["user_id"], data["order_id"], data["amount_to_buy"])
+        if result is None:
+            return json_response({"detail": "Purchase rejected"}, 400)
+        return json_response(result)
+
+    def _delete_batch(self, request) -> Response:
+        data = request.json()
+        return json_response([
+            {"order_id": order_id, "success": self._remove_order(data["user_id"], order_id)}
+            for order_id in data["order_ids"]
+        ])
+
+    def _buy_batch(self, request) -> Response:
+        data = request.json()
+        results = []
+        for item in data["orders"]:
+            result = self._fill(data["user_id"], item["order_id"], item["amount_to_buy"])
+            results.append({"order_id": item["order_id"], "success": result is not None})
+        return json_response(results)
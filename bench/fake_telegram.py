@@ -0,0 +1,182 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import defaultdict, deque
+
+import httpx
+
+from bench.http_stub import StubServer, json_response
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Exchange Bot", "username": "exchange_bot"}
+
+# Methods whose call is a message shown to the user, delivered to the chat's inbox
+MESSAGE_METHODS = {"sendMessage", "editMessageText", "editMessageReplyMarkup"}
+
+
+class FakeTelegram:
+    """Local stand-in for the Bot API server, for running the bot offline.
+
+    Point the bot at it with TELEGRAM_API_URL=<url>. Updates given to push() are handed out by
+    getUpdates, or POSTed to the webhook once the bot has set one. Messages the bot sends or
+    edits are answered like Telegram would and land in the chat's inbox, see next_message().
+    With ``global_rate``/``chat_rate`` set, calls beyond that many per second (overall/per chat)
+    get Telegram's 429 flood-control error, counted in ``flood_errors``.
+    """
+
+    def __init__(self, latency: float = 0.0, global_rate: float = None, chat_rate: float = None):
+        self.latency = latency
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.webhook_url = None
+        self.webhook_secret = None
+        # Every Bot API call as (monotonic time, method, params)
+        self.calls = []
+        self.flood_errors = 0
+        self._server = StubServer(self._handle)
+        self._updates = deque()
+        self._update_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._message_ids = itertools.count(1000)
+        self._inboxes = defaultdict(asyncio.Queue)
+        self._recent = defaultdict(deque)
+        self._webhook_client = None
+        # Set once the bot polls for updates or has registered its webhook
+        self.ready = asyncio.Event()
+
+    @property
+    def url(self) -> str:
+        return self._server.url
+
+    async def start(self) -> None:
+        await self._server.start()
+
+    async def close(self) -> None:
+        if self._webhook_client is not None:
+            await self._webhook_client.aclose()
+        await self._server.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def push(self, update: dict) -> None:
+        """Deliver an update to the bot, assigning it the next update_id."""
+        update = {**update, "update_id": next(self._update_ids)}
+        if self.webhook_url is None:
+            self._updates.append(update)
+            self._new_updates.set()
+            return
+
+        if self._webhook_client is None:
+            self._webhook_client = httpx.AsyncClient(timeout=30)
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+        response = await self._webhook_client.post(self.webhook_url, json=update, headers=headers)
+        response.raise_for_status()
+
+    async def next_message(self, chat_id: int, timeout: float = 10) -> tuple:
+        """Wait for the next message sent or edited in the chat, returning (monotonic time, method, params)."""
+        return await asyncio.wait_for(self._inboxes[chat_id].get(), timeout)
+
+    def drain(self, chat_id: int) -> None:
+        """Forget messages in the chat's inbox that nobody waited for."""
+        inbox = self._inboxes[chat_id]
+        while not inbox.empty():
+            inbox.get_nowait()
+
+    # Serving
+
+    async def _handle(self, request):
+        method = request.path.rsplit("/", 1)[-1]
+        params = _decode(request.form() if request.body else request.query)
+        self.calls.append((time.monotonic(), method, params))
+        if method in ("getUpdates", "setWebhook"):
+            self.ready.set()
+
+        if self.latency and method != "getUpdates":
+            await asyncio.sleep(self.latency)
+        retry_after = self._flood_wait(params.get("chat_id"))
+        if retry_after:
+            self.flood_errors += 1
+            return json_response({
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {retry_after}",
+                "parameters": {"retry_after": retry_after},
+            }, 429)
+
+        result = await self._answer(method, params)
+        if method in MESSAGE_METHODS and "chat_id" in params:
+            self._inboxes[int(params["chat_id"])].put_nowait((time.monotonic(), method, params))
+        return json_response({"ok": True, "result": result})
+
+    def _flood_wait(self, chat_id) -> int:
+        now = time.monotonic()
+        for key, rate in (("global", self.global_rate), (chat_id, self.chat_rate)):
+            if rate is None or key is None:
+                continue
+            recent = self._recent[key]
+            while recent and recent[0] <= now - 1:
+                recent.popleft()
+            if len(recent) >= rate:
+                return 1
+        for key in ("global", chat_id):
+            if key is not None:
+                self._recent[key].append(now)
+        return 0
+
+    async def _answer(self, method: str, params: dict):
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self._get_updates(
+                int(params.get("offset", 0)), float(params.get("timeout", 0)), int(params.get("limit", 100))
+            )
+        if method == "setWebhook":
+            self.webhook_url = params["url"]
+            self.webhook_secret = params.get("secret_token")
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = None
+            return True
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": 0}
+        if method in MESSAGE_METHODS:
+            chat_id = int(params["chat_id"])
+            message = {
+                "message_id": int(params.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group"},
+                "from": BOT_USER,
+                "text": params.get("text", ""),
+            }
+            if "reply_markup" in params:
+                message["reply_markup"] = params["reply_markup"]
+            return message
+        return True
+
+    async def _get_updates(self, offset: int, timeout: float, limit: int) -> list:
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return list(itertools.islice(self._updates, limit))
+
+
+def _decode(params: dict) -> dict:
+    """Undo the Bot API's form encoding, where every value that isn't a string is JSON-encoded."""
+    decoded = {}
+    for name, value in params.items():
+        if name == "text":
+            decoded[name] = value
+            continue
+        try:
+            decoded[name] = json.loads(value)
+        except ValueError:
+            decoded[name] = value
+    return decoded
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+from urllib.parse import urlsplit, parse_qsl
+
+_REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 409: "Conflict",
+            500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class DropConnection(Exception):
+    """Raised by a route to close the connection without sending a response."""
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers", "body")
+
+    def __init__(self, method: str, target: str, headers: dict, body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+    def form(self) -> dict:
+        return dict(parse_qsl(self.body.decode()))
+
+
+class Response:
+    __slots__ = ("status", "body", "headers")
+
+    def __init__(self, status: int = 200, body: bytes = b"", headers: dict = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+def json_response(data, status: int = 200) -> Response:
+    return Response(status, json.dumps(data).encode(), {"Content-Type": "application/json"})
+
+
+class StubServer:
+    """Minimal keep-alive HTTP/1.1 server on an ephemeral local port, for fakes used by tests and benchmarks.
+
+    Every request is passed to ``handler(request) -> Response``; the handler may sleep to
+    simulate latency or raise DropConnection to simulate a dying peer.
+    """
+
+    def __init__(self, handler, host: str = "127.0.0.1", port: int = 0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self._server = None
+        self._connections = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                try:
+                    response = await self.handler(request)
+                except DropConnection:
+                    break
+
+                headers = {"Content-Length": str(len(response.body)), **response.headers}
+                head = f"HTTP/1.1 {response.status} {_REASONS.get(response.status, 'Unknown')}\r\n"
+                head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+                writer.write(head.encode() + b"\r\n" + response.body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, target, _ = line.decode().split(" ", 2)
+
+        headers = {}
+        while (line := await reader.readline()).strip():
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return Request(method, target, headers, body)
+
+
+class InThread:
+    """Run a fake server (anything with async start() and close()) on an event loop in a background thread.
+
+    Needed when the code under test blocks its own event loop, which would otherwise stall the fake too.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self._loop).result()
+        return self.server
+
+    def __exit__(self, *exc_info) -> None:
+        asyncio.run_coroutine_threadsafe(self.server.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
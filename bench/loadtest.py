@@ -0,0 +1,183 @@
+"""Load test: scripted conversations through the real bot, offline.
+
+Runs main.py against a local fake Bot API server and a fake backend with the given latency.
+Every simulated user goes through one scripted conversation after another, sending each step
+once the bot has answered the previous one, as a person would. Reports the throughput in
+answered updates per second, the latency percentiles of every step (from handing the update to
+the fake Bot API to the bot's answer), unanswered steps and the bot's peak memory.
+
+Scenarios: create_account (/start, password, mnemonic saved), create_order (the whole order
+creation flow), buy (pick a pair, buy from an order) and browse (my orders, the buy list and its
+second page). Bot settings can be passed with --env, e.g. --env CONCURRENT_UPDATES=64.
+
+    python -m bench.loadtest --users 100 --iterations 3 --backend-latency 0.02
+    python -m bench.loadtest --scenarios buy,browse --env PERSISTENCE_PATH=/tmp/bot.sqlite
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+
+from bench import bot_process
+from bench.bot_process import BotProcess
+from bench.fake_backend import FakeBackend
+from bench.fake_telegram import FakeTelegram
+from bench.report import latency_summary
+from bench.updates import callback_update, command_update, message_update
+import callbacks
+
+# Users placing the orders that simulated users buy from and browse
+SELLERS = range(1, 11)
+FIRST_USER_ID = 1000
+
+
+def text(user_id: int, value: str) -> dict:
+    return message_update(0, user_id, value).to_dict()
+
+
+def press(user_id: int, code: str, *args) -> dict:
+    return callback_update(0, user_id, callbacks.encode(code, *args)).to_dict()
+
+
+def command(user_id: int, value: str) -> dict:
+    return command_update(0, user_id, value).to_dict()
+
+
+# Each scenario is a list of (step name, update, text the bot's answer contains)
+
+def create_account(user_id: int, world) -> list:
+    return [
+        ("start", command(user_id, "/start"), "create an account"),
+        ("create_account", press(user_id, callbacks.CREATE_ACCOUNT), "enter a password"),
+        ("password", text(user_id, "hunter22"), "created successfully"),
+        ("mnemonic_saved", press(user_id, callbacks.MNEMONIC_SAVED), "What would you like to do"),
+    ]
+
+
+def create_order(user_id: int, world) -> list:
+    return [
+        ("start", command(user_id, "/start"), "What would you like to do"),
+        ("orders_menu", press(user_id, callbacks.ORDERS_MENU), "with your orders"),
+        ("create_order", press(user_id, callbacks.CREATE_ORDER), "from_currency"),
+        ("from_currency", text(user_id, "ETH"), "to_currency"),
+        ("to_currency", text(user_id, "USDT"), "amount to sell"),
+        ("value", text(user_id, "1"), "exchange rate"),
+        ("exchange_rate", text(user_id, "2000"), "Order created successfully"),
+    ]
+
+
+def buy(user_id: int, world) -> list:
+    return [
+        ("start", command(user_id, "/start"), "What would you like to do"),
+        ("buy_crypto", press(user_id, callbacks.BUY_CRYPTO), "like to buy"),
+        ("buy_currency", text(user_id, "BTC"), "like to sell"),
+        ("sell_currency", text(user_id, "USDT"), "orders that you can buy"),
+        ("buy_order", press(user_id, callbacks.BUY_ORDER, next(world["order_ids"])), "amount you'd like to buy"),
+        ("amount_to_buy", text(user_id, "0.001"), "purchase was successful"),
+    ]
+
+
+def browse(user_id: int, world) -> list:
+    return [
+        ("start", command(user_id, "/start"), "What would you like to do"),
+        ("orders_menu", press(user_id, callbacks.ORDERS_MENU), "with your orders"),
+        ("my_orders", press(user_id, callbacks.MY_ORDERS), "orders"),
+        ("buy_crypto", press(user_id, callbacks.BUY_CRYPTO), "like to buy"),
+        ("buy_currency", text(user_id, "BTC"), "like to sell"),
+        ("sell_currency", text(user_id, "USDT"), "orders that you can buy"),
+        ("buy_orders_page", press(user_id, callbacks.BUY_ORDERS_PAGE, 1), "orders that you can buy"),
+        ("main_menu", press(user_id, callbacks.MAIN_MENU), "What would you like to do"),
+    ]
+
+
+SCENARIOS = {"create_account": create_account, "create_order": create_order, "buy": buy, "browse": browse}
+
+
+async def wait_for_answer(fake: FakeTelegram, chat_id: int, expect: str, timeout: float):
+    """Wait for a message or edit in the chat containing expect, returning its time or None on timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            at, _, params = await fake.next_message(chat_id, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            return None
+        if expect in str(params.get("text", "")):
+            return at
+
+
+async def simulate_user(fake: FakeTelegram, user_id: int, scenarios: list, world, args, samples: dict,
+                        unanswered: dict) -> None:
+    for iteration in range(args.iterations):
+        scenario = scenarios[(user_id + iteration) % len(scenarios)]
+        if scenario == "create_account" and iteration:
+            # An account can only be created once
+            continue
+        for step, update, expect in SCENARIOS[scenario](user_id, world):
+            fake.drain(user_id)
+            sent = time.monotonic()
+            await fake.push(update)
+            answered = await wait_for_answer(fake, user_id, expect, args.timeout)
+            if answered is None:
+                unanswered[f"{scenario}.{step}"] += 1
+                # The conversation is off script; start the next one from /start
+                break
+            samples[f"{scenario}.{step}"].append(answered - sent)
+            if args.think:
+                await asyncio.sleep(args.think)
+
+
+async def main(args) -> None:
+    backend = FakeBackend(latency=args.backend_latency)
+    fake = FakeTelegram(latency=args.telegram_latency)
+    await backend.start()
+    await fake.start()
+
+    order_ids = [backend.add_order(seller, "BTC", "USDT", 1000, 30000) for seller in SELLERS for _ in range(3)]
+    for seller in SELLERS:
+        backend.add_user(seller)
+    world = {"order_ids": itertools.cycle(order_ids)}
+
+    users = range(FIRST_USER_ID, FIRST_USER_ID + args.users)
+    for user_id in users:
+        # Users whose first scenario creates their account start without one
+        if args.scenarios[user_id % len(args.scenarios)] != "create_account":
+            backend.add_user(user_id)
+
+    samples, unanswered = defaultdict(list), defaultdict(int)
+    env = {**bot_process.UNLIMITED_RATES, "WEBHOOK_URL": "", **dict(args.env)}
+    bot = BotProcess(fake.url, backend.url, env)
+    async with bot:
+        await asyncio.wait_for(fake.ready.wait(), 60)
+        started = time.monotonic()
+        await asyncio.gather(*(
+            simulate_user(fake, user_id, args.scenarios, world, args, samples, unanswered) for user_id in users
+        ))
+        elapsed = time.monotonic() - started
+        peak_memory = bot.peak_memory()
+
+    await fake.close()
+    await backend.close()
+
+    answered = sum(len(latencies) for latencies in samples.values())
+    print(f"{args.users} users, {args.iterations} conversations each, backend latency {args.backend_latency * 1000:.0f} ms")
+    print(f"  {'throughput':30} {answered / elapsed:.1f} updates/s ({answered} answered in {elapsed:.1f} s)")
+    print(f"  {'all steps':30} {latency_summary([latency for latencies in samples.values() for latency in latencies])}")
+    for step in sorted(set(samples) | set(unanswered)):
+        print(f"  {step:30} {latency_summary(samples[step]) if samples[step] else '':45} unanswered={unanswered[step]}")
+    print(f"  {'peak memory':30} {peak_memory / 2 ** 20:.1f} MiB")
+    print(f"  {'calls':30} backend {sum(backend.requests.values())}, Bot API {len(fake.calls)}, 429s {fake.flood_errors}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=3, help="conversations per user")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS))
+    parser.add_argument("--backend-latency", type=float, default=0.02, help="backend latency in seconds")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Bot API latency in seconds")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds a user waits between steps")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds to wait for the bot's answer to a step")
+    parser.add_argument("--env", action="append", default=[], type=lambda value: value.split("=", 1),
+                        help="bot setting as NAME=VALUE, may be repeated")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""Micro-benchmark: cost of the latency instrumentation on the hot path.
+
+Times, per call, an empty block with and without metrics.timer(), a trivial async handler with
+and without metrics.instrument(), backend.request()'s counter update, and rendering the
+metrics endpoint once the given number of labelled series exist.
+
+    python -m bench.metrics_overhead --calls 200000 --series 200
+"""
+import argparse
+import time
+
+import metrics
+
+
+def per_call(function, calls: int) -> float:
+    """Seconds per call of function, best of three runs."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best = min(best, time.perf_counter() - started)
+    return best / calls
+
+
+def empty_block() -> None:
+    pass
+
+
+def timed_block() -> None:
+    with metrics.timer("bench_seconds", endpoint="/user/info"):
+        pass
+
+
+def counted() -> None:
+    metrics.increment("bench_responses_total", method="GET", endpoint="/user/info", status=200)
+
+
+async def handler(update, context) -> None:
+    pass
+
+
+def awaiting(callback):
+    """A function driving one await of callback, without the event loop's scheduling cost."""
+    def call() -> None:
+        coroutine = callback(None, None)
+        try:
+            coroutine.send(None)
+        except StopIteration:
+            pass
+    return call
+
+
+def main(args) -> None:
+    plain, timed = per_call(empty_block, args.calls), per_call(timed_block, args.calls)
+    print(f"timer():          {(timed - plain) * 1e6:6.2f} µs per timed block")
+    print(f"increment():      {(per_call(counted, args.calls) - plain) * 1e6:6.2f} µs per counter update")
+
+    bare = per_call(awaiting(handler), args.calls)
+    wrapped = per_call(awaiting(metrics.instrument(handler)), args.calls)
+    print(f"instrument():     {(wrapped - bare) * 1e6:6.2f} µs per handler call")
+
+    for series in range(args.series):
+        metrics.observe("bench_series_seconds", 0.01, endpoint=f"/endpoint/{series}")
+    render = per_call(metrics.render, max(1, args.calls // 10000))
+    print(f"render():         {render * 1e3:6.2f} ms for {len(metrics.histograms)} histograms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--series", type=int, default=200, help="labelled histograms present when rendering")
+    main(parser.parse_args())
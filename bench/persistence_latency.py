@@ -0,0 +1,126 @@
+"""Benchmark: update latency with SQLite persistence off vs. on.
+
+Runs a real Application, offline, with a persistent two-step ConversationHandler whose steps
+update user_data, like the order creation flow does. Updates from many users arrive at a fixed
+rate, and the latency from arrival to the end of the step is measured. With --contend, a second
+process keeps taking the database's write lock, as another bot instance sharing it would.
+
+    python -m bench.persistence_latency --users 200 --updates 4000 --rate 500 --contend
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from telegram.ext import Application, ConversationHandler, MessageHandler, filters
+from telegram.request import BaseRequest
+
+from bench.report import latency_summary
+from bench.updates import message_update
+from persistence import SQLitePersistence
+from update_processor import PerUserUpdateProcessor
+
+
+class OfflineRequest(BaseRequest):
+    """Answers getMe locally so an Application can be initialized without reaching Telegram."""
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        result = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def build(persistence, latencies: dict, arrivals: dict) -> Application:
+    async def step(update, context) -> int:
+        context.user_data["steps"] = context.user_data.get("steps", 0) + 1
+        context.user_data["last_text"] = update.message.text
+        latencies.append(time.perf_counter() - arrivals.pop(update.update_id))
+        return 1 - context.user_data["steps"] % 2
+
+    text = filters.TEXT & ~filters.COMMAND
+    builder = (
+        Application.builder().token("1:bench").request(OfflineRequest()).updater(None)
+        .concurrent_updates(PerUserUpdateProcessor(64))
+    )
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    application = builder.build()
+    application.add_handler(ConversationHandler(
+        entry_points=[MessageHandler(text, step)],
+        states={0: [MessageHandler(text, step)], 1: [MessageHandler(text, step)]},
+        fallbacks=[], name="bench", persistent=persistence is not None,
+    ))
+    return application
+
+
+async def run(persistence, args) -> list:
+    latencies, arrivals = [], {}
+    application = build(persistence, latencies, arrivals)
+    async with application:
+        await application.start()
+        started = time.perf_counter()
+        for update_id in range(args.updates):
+            # Latency counts from the scheduled arrival, so updates held up by a stalled event loop show it
+            arrivals[update_id] = started + update_id / args.rate
+            await asyncio.sleep(max(0.0, arrivals[update_id] - time.perf_counter()))
+            await application.update_queue.put(message_update(update_id, update_id % args.users, f"step {update_id}"))
+        while arrivals:
+            await asyncio.sleep(0.01)
+        await application.stop()
+    return latencies
+
+
+def contend(path: str, stop) -> None:
+    """Keep taking the write lock for 50 ms at a time, like a busy second instance."""
+    connection = sqlite3.connect(path, isolation_level=None, timeout=5)
+    while not stop.is_set():
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("INSERT OR REPLACE INTO bot_data (id, data) VALUES (0, ?)", (os.urandom(64),))
+        time.sleep(0.05)
+        connection.execute("COMMIT")
+        time.sleep(0.01)
+
+
+async def main(args) -> None:
+    print(f"{args.updates} updates from {args.users} users at {args.rate:.0f} updates/s")
+    print(f"  {'persistence off':26} {latency_summary(await run(None, args))}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "state.sqlite")
+        persistence = SQLitePersistence(path, update_interval=1, write_delay=0.5)
+
+        stop = multiprocessing.Event()
+        competitor = multiprocessing.Process(target=contend, args=(path, stop)) if args.contend else None
+        if competitor is not None:
+            competitor.start()
+        try:
+            latencies = await run(persistence, args)
+        finally:
+            stop.set()
+            if competitor is not None:
+                competitor.join()
+        label = "persistence on" + (" (contended)" if args.contend else "")
+        print(f"  {label:26} {latency_summary(latencies)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--updates", type=int, default=4000)
+    parser.add_argument("--rate", type=float, default=500, help="updates arriving per second")
+    parser.add_argument("--contend", action="store_true", help="run a second process writing to the database")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,11 @@
+def percentile(samples: list, q: float) -> float:
+    """Return the q-quantile (0..1) of the samples, or 0 when there are none."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(samples: list) -> str:
+    """Format p50/p95/p99 of latencies given in seconds, in milliseconds."""
+    return "  ".join(f"p{int(q * 100)}={percentile(samples, q) * 1000:8.2f}ms" for q in (0.5, 0.95, 0.99))
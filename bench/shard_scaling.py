@@ -0,0 +1,90 @@
+"""Benchmark: throughput of the bot as the number of shards grows.
+
+Runs the load test's scripted conversations (see bench/loadtest.py) once per shard count, each
+against a fresh fake Bot API and fake backend, and reports the answered updates per second, the
+step latency percentiles, the backend requests and the peak memory of the router and workers.
+Shards only add throughput when there are CPU cores to run them on; the script prints how many
+this machine has.
+
+    python -m bench.shard_scaling --shards 1,2,4 --users 100 --iterations 3
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import time
+from collections import defaultdict
+
+from bench import bot_process
+from bench.bot_process import BotProcess
+from bench.fake_backend import FakeBackend
+from bench.fake_telegram import FakeTelegram
+from bench.loadtest import FIRST_USER_ID, SELLERS, simulate_user
+from bench.report import latency_summary
+
+
+async def run(shards: int, args) -> dict:
+    backend = FakeBackend(latency=args.backend_latency)
+    fake = FakeTelegram()
+    await backend.start()
+    await fake.start()
+
+    order_ids = [backend.add_order(seller, "BTC", "USDT", 1000, 30000) for seller in SELLERS for _ in range(3)]
+    for seller in SELLERS:
+        backend.add_user(seller)
+    world = {"order_ids": itertools.cycle(order_ids)}
+    users = range(FIRST_USER_ID, FIRST_USER_ID + args.users)
+    for user_id in users:
+        backend.add_user(user_id)
+
+    samples, unanswered = defaultdict(list), defaultdict(int)
+    env = {**bot_process.UNLIMITED_RATES, "WEBHOOK_URL": "", "SHARDS": str(shards)}
+    bot = BotProcess(fake.url, backend.url, env)
+    async with bot:
+        await asyncio.wait_for(fake.ready.wait(), 60)
+        # Let every worker start before the clock does
+        await asyncio.sleep(args.warmup)
+        started = time.monotonic()
+        await asyncio.gather(*(
+            simulate_user(fake, user_id, args.scenarios, world, args, samples, unanswered) for user_id in users
+        ))
+        elapsed = time.monotonic() - started
+        peak_memory = bot.peak_memory()
+
+    await fake.close()
+    await backend.close()
+
+    latencies = [latency for step in samples.values() for latency in step]
+    return {
+        "throughput": len(latencies) / elapsed,
+        "latencies": latencies,
+        "unanswered": sum(unanswered.values()),
+        "backend_requests": sum(backend.requests.values()),
+        "peak_memory": peak_memory,
+    }
+
+
+async def main(args) -> None:
+    print(f"{args.users} users, {args.iterations} conversations each, {os.cpu_count()} CPU cores")
+    baseline = None
+    for shards in args.shards:
+        result = await run(shards, args)
+        baseline = baseline or result["throughput"]
+        print(
+            f"  {shards:2} shards  {result['throughput']:7.1f} updates/s ({result['throughput'] / baseline:4.2f}x)"
+            f"  {latency_summary(result['latencies'])}  unanswered={result['unanswered']}"
+            f"  backend requests {result['backend_requests']}  peak memory {result['peak_memory'] / 2 ** 20:.0f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=lambda value: [int(part) for part in value.split(",")], default=[1, 2, 4])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=3, help="conversations per user")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=["buy", "browse"])
+    parser.add_argument("--backend-latency", type=float, default=0.02, help="backend latency in seconds")
+    parser.add_argument("--think", type=float, default=0.0, help="seconds a user waits between steps")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds to wait for the bot's answer to a step")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds to let the workers start")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,64 @@
+"""Benchmark: updates/second with sequential vs. per-user concurrent update processing.
+
+Simulated users each send the same number of updates, all queued at once. Every update makes
+one /user/info call to a local fake backend, as get_user_info does. Sequential processing is the
+application's default; the concurrent mode is PerUserUpdateProcessor with the given cap.
+
+    python -m bench.update_throughput --users 1,10,100 --updates 500 --latency 0.02 --cap 64
+"""
+import argparse
+import asyncio
+import time
+
+import backend
+from bench.fake_backend import FakeBackend
+from bench.report import latency_summary
+from bench.updates import message_update
+from update_processor import PerUserUpdateProcessor
+
+
+async def run(updates: list, processor) -> tuple:
+    """Process the updates, returning (updates/s, latencies from arrival to completion)."""
+    latencies = []
+    arrived = time.perf_counter()
+
+    async def handle(update) -> None:
+        response = await backend.get("/user/info", params={"user_id": update.effective_user.id})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - arrived)
+
+    if processor is None:
+        for update in updates:
+            await handle(update)
+    else:
+        await asyncio.gather(*(
+            asyncio.create_task(processor.process_update(update, handle(update))) for update in updates
+        ))
+    return len(updates) / (time.perf_counter() - arrived), latencies
+
+
+async def main(args) -> None:
+    fake = FakeBackend(latency=args.latency)
+    await fake.start()
+    backend.API_URL = fake.url
+    for user_id in range(max(args.users)):
+        fake.add_user(user_id)
+
+    print(f"{args.updates} updates per run, backend latency {args.latency * 1000:.0f} ms, concurrency cap {args.cap}")
+    for users in args.users:
+        updates = [message_update(update_id, update_id % users) for update_id in range(args.updates)]
+        for name, processor in (("sequential", None), ("per-user", PerUserUpdateProcessor(args.cap))):
+            throughput, latencies = await run(updates, processor)
+            print(f"  users={users:<4} {name:10} {throughput:9.1f} updates/s  {latency_summary(latencies)}")
+
+    await backend.close()
+    await fake.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=lambda value: [int(part) for part in value.split(",")], default=[1, 10, 100])
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="backend latency in seconds")
+    parser.add_argument("--cap", type=int, default=64, help="maximum updates processed concurrently")
+    asyncio.run(main(parser.parse_args()))
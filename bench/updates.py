@@ -0,0 +1,29 @@
+import datetime
+
+from telegram import CallbackQuery, Chat, Message, MessageEntity, Update, User
+
+
+def _message(message_id: int, user_id: int, text: str = None, entities: list = None) -> Message:
+    return Message(
+        message_id, datetime.datetime.now(datetime.timezone.utc), Chat(user_id, Chat.PRIVATE),
+        from_user=User(user_id, f"user{user_id}", False), text=text, entities=entities,
+    )
+
+
+def message_update(update_id: int, user_id: int, text: str = "hi") -> Update:
+    """A private text message from the user."""
+    return Update(update_id, message=_message(update_id, user_id, text))
+
+
+def callback_update(update_id: int, user_id: int, data: str) -> Update:
+    """A press of an inline button carrying the given callback data under one of the bot's messages."""
+    return Update(update_id, callback_query=CallbackQuery(
+        str(update_id), User(user_id, f"user{user_id}", False), "instance", message=_message(update_id, user_id),
+        data=data,
+    ))
+
+
+def command_update(update_id: int, user_id: int, command: str) -> Update:
+    """A bot command such as '/start' sent by the user."""
+    entity = MessageEntity(MessageEntity.BOT_COMMAND, 0, len(command.split()[0]))
+    return Update(update_id, message=_message(update_id, user_id, command, [entity]))
@@ -0,0 +1,130 @@
+"""Benchmark: reply latency with updates fetched by long polling vs. pushed to a webhook.
+
+Runs the real bot (main.py) against a local fake Bot API server and fake backend, replays the
+same updates in both modes and measures the time from an update being handed to the fake Bot
+API to the bot's first message or edit in that chat. Each user waits for the reply to one update
+before sending the next, as a person would. Updates come from a recording (one Update JSON per
+line, e.g. from a logging proxy) or, by default, from synthetic users pressing through the menu.
+
+    python -m bench.webhook_replay --users 50 --rounds 10
+    python -m bench.webhook_replay --replay updates.jsonl --modes webhook
+"""
+import argparse
+import asyncio
+import json
+import socket
+import time
+from collections import defaultdict
+
+from bench import bot_process
+from bench.bot_process import BotProcess
+from bench.fake_backend import FakeBackend
+from bench.fake_telegram import FakeTelegram
+from bench.report import latency_summary
+from bench.updates import callback_update, command_update
+import callbacks
+
+
+def synthetic_updates(users: int, rounds: int) -> dict:
+    """Per user: /start, then alternately open the user info and go back to the main menu."""
+    updates = defaultdict(list)
+    for user_id in range(1, users + 1):
+        updates[user_id].append(command_update(0, user_id, "/start").to_dict())
+        for step in range(rounds):
+            data = callbacks.GET_USER_INFO if step % 2 == 0 else callbacks.MAIN_MENU
+            updates[user_id].append(callback_update(0, user_id, data).to_dict())
+    return updates
+
+
+def recorded_updates(path: str) -> dict:
+    """Updates from a JSONL recording, grouped by the user who sent them, in their original order."""
+    updates = defaultdict(list)
+    with open(path) as recording:
+        for line in recording:
+            if not line.strip():
+                continue
+            update = json.loads(line)
+            event = update.get("message") or update.get("callback_query") or {}
+            if "from" in event:
+                updates[event["from"]["id"]].append(update)
+    return updates
+
+
+async def replay_user(fake: FakeTelegram, chat_id: int, updates: list, timeout: float) -> tuple:
+    """Send the user's updates one by one, returning (latencies, updates that got no reply in time)."""
+    latencies, unanswered = [], 0
+    for update in updates:
+        fake.drain(chat_id)
+        sent = time.monotonic()
+        await fake.push(update)
+        try:
+            replied, _, _ = await fake.next_message(chat_id, timeout)
+        except asyncio.TimeoutError:
+            unanswered += 1
+            continue
+        latencies.append(replied - sent)
+    return latencies, unanswered
+
+
+async def run(mode: str, updates: dict, args) -> tuple:
+    """Replay the updates against a fresh bot in the given mode, returning (latencies, unanswered)."""
+    async with FakeBackend(latency=args.backend_latency) as backend, FakeTelegram() as fake:
+        for user_id in updates:
+            backend.add_user(user_id)
+        env = dict(bot_process.UNLIMITED_RATES)
+        if mode == "webhook":
+            port = free_port()
+            env.update(WEBHOOK_URL=f"http://127.0.0.1:{port}", WEBHOOK_LISTEN="127.0.0.1", WEBHOOK_PORT=str(port))
+        else:
+            env["WEBHOOK_URL"] = ""
+
+        async with BotProcess(fake.url, backend.url, env):
+            await asyncio.wait_for(fake.ready.wait(), 60)
+            if mode == "webhook":
+                # The webhook is registered just before the bot's server starts listening
+                await wait_for_port(int(env["WEBHOOK_PORT"]))
+            results = await asyncio.gather(*(
+                replay_user(fake, chat_id, user_updates, args.timeout) for chat_id, user_updates in updates.items()
+            ))
+    latencies = [latency for user_latencies, _ in results for latency in user_latencies]
+    return latencies, sum(unanswered for _, unanswered in results)
+
+
+async def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+            continue
+        writer.close()
+        return
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def main(args) -> None:
+    updates = recorded_updates(args.replay) if args.replay else synthetic_updates(args.users, args.rounds)
+    total = sum(len(user_updates) for user_updates in updates.values())
+    print(f"{total} updates from {len(updates)} users, backend latency {args.backend_latency * 1000:.0f} ms")
+    for mode in args.modes:
+        latencies, unanswered = await run(mode, updates, args)
+        print(f"  {mode:8} {latency_summary(latencies)}  unanswered={unanswered}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10, help="menu presses per synthetic user after /start")
+    parser.add_argument("--replay", help="JSONL file of recorded updates to replay instead of synthetic ones")
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=["polling", "webhook"])
+    parser.add_argument("--backend-latency", type=float, default=0.02, help="backend latency in seconds")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds to wait for a reply to each update")
+    asyncio.run(main(parser.parse_args()))
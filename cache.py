@@ -0,0 +1,68 @@
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries may expire after a per-entry TTL.
+
+    An entry stored with ``ttl=None`` never expires and is only dropped by LRU eviction
+    or explicit invalidation.
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, expires_at or None)
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=_MISSING) -> None:
+        """Store value under key; ttl defaults to the cache-wide TTL."""
+        if ttl is _MISSING:
+            ttl = self.ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def items(self) -> list:
+        """Return (key, value) pairs of unexpired entries without touching LRU order or counters."""
+        now = time.monotonic()
+        return [
+            (key, value) for key, (value, expires_at) in self._data.items()
+            if expires_at is None or expires_at > now
+        ]
+
+    def invalidate(self, key) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._data)
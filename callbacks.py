@@ -0,0 +1,149 @@
+from telegram import Update
+from telegram.ext import CallbackQueryHandler
+
+# Separates the action code from its arguments in callback data, e.g. "bo:42"
+SEPARATOR = ":"
+
+# Action codes sent as callback data
+MAIN_MENU = "mm"
+GET_USER_INFO = "ui"
+RECOVER_PASSWORD = "rp"
+CREATE_ACCOUNT = "ca"
+MNEMONIC_SAVED = "ms"
+ORDERS_MENU = "om"
+CREATE_ORDER = "co"
+MY_ORDERS = "mo"
+DELETE_ORDER = "do"
+SELECT_ORDERS = "so"
+CANCEL_SELECT_ORDERS = "xo"
+TOGGLE_ORDER = "to"
+BULK_DELETE_ORDERS = "bd"
+BUY_CRYPTO = "bc"
+BUY_ORDER = "bo"
+BUY_ORDERS_PAGE = "bp"
+SELECT_BUY_ORDERS = "sb"
+CANCEL_SELECT_BUY_ORDERS = "xb"
+TOGGLE_BUY_ORDER = "tb"
+BULK_BUY_ORDERS = "bb"
+SUBSCRIBE_PAIR = "sp"
+UNSUBSCRIBE_PAIR = "up"
+CHOOSE_CURRENCY = "cc"
+
+# code -> types of its arguments; trailing arguments may be left out
+ARGUMENT_TYPES = {
+    MAIN_MENU: (),
+    GET_USER_INFO: (),
+    RECOVER_PASSWORD: (),
+    CREATE_ACCOUNT: (),
+    MNEMONIC_SAVED: (),
+    ORDERS_MENU: (),
+    CREATE_ORDER: (),
+    MY_ORDERS: (int,),  # page
+    DELETE_ORDER: (int,),  # order_id
+    SELECT_ORDERS: (),
+    CANCEL_SELECT_ORDERS: (),
+    TOGGLE_ORDER: (int,),  # order_id
+    BULK_DELETE_ORDERS: (),
+    BUY_CRYPTO: (),
+    BUY_ORDER: (int, str, str),  # order_id, buy_currency, sell_currency
+    BUY_ORDERS_PAGE: (int,),  # page
+    SELECT_BUY_ORDERS: (),
+    CANCEL_SELECT_BUY_ORDERS: (),
+    TOGGLE_BUY_ORDER: (int,),  # order_id
+    BULK_BUY_ORDERS: (),
+    SUBSCRIBE_PAIR: (str, str),  # buy_currency, sell_currency
+    UNSUBSCRIBE_PAIR: (str, str),  # buy_currency, sell_currency
+    CHOOSE_CURRENCY: (str,),  # currency
+}
+
+# Callback data names used before the compact format, so buttons in older messages keep working
+_LEGACY_NAMES = {
+    "main_menu": MAIN_MENU,
+    "get_user_info": GET_USER_INFO,
+    "recover_password": RECOVER_PASSWORD,
+    "create_account": CREATE_ACCOUNT,
+    "mnemonic_saved": MNEMONIC_SAVED,
+    "orders": ORDERS_MENU,
+    "create_order": CREATE_ORDER,
+    "my_orders": MY_ORDERS,
+    "delete_order": DELETE_ORDER,
+    "select_orders": SELECT_ORDERS,
+    "cancel_select_orders": CANCEL_SELECT_ORDERS,
+    "toggle_order": TOGGLE_ORDER,
+    "bulk_delete_orders": BULK_DELETE_ORDERS,
+    "buy_crypto": BUY_CRYPTO,
+    "buy_order": BUY_ORDER,
+    "buy_orders": BUY_ORDERS_PAGE,
+    "select_buy_orders": SELECT_BUY_ORDERS,
+    "cancel_select_buy_orders": CANCEL_SELECT_BUY_ORDERS,
+    "toggle_buy": TOGGLE_BUY_ORDER,
+    "bulk_buy_orders": BULK_BUY_ORDERS,
+    "subscribe_pair": SUBSCRIBE_PAIR,
+    "unsubscribe_pair": UNSUBSCRIBE_PAIR,
+}
+
+
+def encode(code: str, *args) -> str:
+    """Build the callback data for an action, e.g. encode(BUY_ORDER, 42) -> 'bo:42'."""
+    return SEPARATOR.join((code, *map(str, args))) if args else code
+
+
+def parse(data: str) -> tuple:
+    """Split callback data into its action code and typed arguments; the code is None for unknown data."""
+    code, _, rest = data.partition(SEPARATOR)
+    types = ARGUMENT_TYPES.get(code)
+    if types is None:
+        legacy = _from_legacy(data)
+        return parse(legacy) if legacy is not None else (None, ())
+
+    # The last argument takes the rest of the data, so it may itself contain the separator
+    raw = rest.split(SEPARATOR, len(types) - 1) if rest and types else []
+    if len(raw) > len(types) or (rest and not types):
+        return None, ()
+    try:
+        return code, tuple(convert(value) for convert, value in zip(types, raw))
+    except ValueError:
+        return None, ()
+
+
+def _from_legacy(data: str):
+    """Translate callback data such as 'buy_order_42' or 'unsubscribe_pair:BTC:USDT' to the compact format."""
+    if SEPARATOR in data:
+        name, _, args = data.partition(SEPARATOR)
+    elif data[-1:].isdigit():
+        name, _, args = data.rpartition("_")
+    else:
+        name, args = data, ""
+    code = _LEGACY_NAMES.get(name)
+    if code is None:
+        return None
+    return f"{code}{SEPARATOR}{args}" if args else code
+
+
+class CallbackRouter(CallbackQueryHandler):
+    """Dispatch callback queries to callbacks by the action code in their data.
+
+    Matching costs one dictionary lookup however many actions are routed, instead of trying a
+    regex per registered handler. The parsed arguments are passed to the callback as context.args
+    and the action code as context.action_code, so the data is parsed only once per update.
+    """
+
+    def __init__(self, routes: dict, block: bool = True):
+        self.routes = dict(routes)
+        super().__init__(self._dispatch, block=block)
+
+    def check_update(self, update: object):
+        if not (isinstance(update, Update) and update.callback_query):
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        code, args = parse(data)
+        return (code, args) if code in self.routes else None
+
+    def collect_additional_context(self, context, update, application, check_result) -> None:
+        context.action_code = check_result[0]
+        context.args = list(check_result[1])
+
+    async def _dispatch(self, update: Update, context):
+        return await self.routes[context.action_code](update, context)
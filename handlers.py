@@ -1,7 +1,18 @@
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import CallbackQueryHandler, MessageHandler, filters, ConversationHandler, ContextTypes
-import requests
-from utils import API_URL
+import uuid
+
+from telegram import Update, InlineKeyboardMarkup
+from telegram.ext import MessageHandler, filters, ConversationHandler, ContextTypes
+import backend
+import batch
+import callbacks
+import keyboards
+from callbacks import CallbackRouter
+from cache import TTLCache
+from orderbook import order_books, order_rate
+from userinfo import user_infos
+from validation import ValidationError, currencies, parse_amount, check_pair
+from watcher import order_watcher
+from utils import USER_EXISTS_CACHE_SIZE, USER_EXISTS_NEGATIVE_TTL, ORDERS_PAGE_SIZE, PERSISTENCE_PATH, OPTIMISTIC_UI
 
 # Conversation states
 ASK_PASSWORD, ASK_MNEMONIC = range(2)
@@ -10,25 +21,71 @@ ASK_FROM_CURRENCY, ASK_TO_CURRENCY, ASK_VALUE, ASK_EXCHANGE_RATE = range(4)
 ASK_BUY_CURRENCY, ASK_SELL_CURRENCY = range(2)
 AMOUNT_TO_BUY, _ = range(2)
 
+# Shown when the backend is unavailable and a handler falls back to the last data it returned
+STALE_DATA_NOTICE = "⚠️ The service is temporarily unavailable, showing the last known data."
+
+# Most currency choice buttons offered under a question
+MAX_CURRENCY_CHOICES = 20
+
+# telegram_id -> whether the user has an account
+user_exists_cache = TTLCache(maxsize=USER_EXISTS_CACHE_SIZE)
+
+
+async def user_exists(telegram_id: int) -> bool:
+    """Check whether the user has an account, consulting the existence cache first."""
+    exists = user_exists_cache.get(telegram_id)
+    if exists is not None:
+        return exists
+
+    response = await backend.get("/user/exist", params={"user_id": telegram_id})
+    if response.status_code != 200:
+        return False
+
+    exists = bool(response.json().get("exists"))
+    # Accounts are never removed, so only a negative answer can go stale
+    user_exists_cache.set(telegram_id, exists, ttl=None if exists else USER_EXISTS_NEGATIVE_TTL)
+    return exists
+
+
+async def edit_when_done(message, work, reply_markup=None) -> None:
+    """Await a background mutation and edit the text it returns into the 'processing' message."""
+    try:
+        message_text = await work
+    except Exception as e:
+        print(f"Background operation failed: {e}")
+        # The backend may have applied the mutation before the failure, so don't suggest simply retrying
+        message_text = "❌ Something went wrong. Please check My Orders and your balance before trying again."
+    try:
+        await message.edit_text(message_text, reply_markup=reply_markup)
+    except Exception as e:
+        print(f"Failed to show the result of a background operation: {e}")
+
+
+def currency_keyboard(exclude: str = None):
+    """Choice buttons for the known currencies, or None while no currency is known."""
+    choices = tuple(code for code in currencies.choices() if code != exclude)[:MAX_CURRENCY_CHOICES]
+    return keyboards.currency_choices(choices) if choices else None
+
+
+async def read_answer(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
+    """Return the user's answer to a question: the currency picked with a choice button, or the text sent."""
+    if update.callback_query:
+        await update.callback_query.answer()
+        return context.args[0]
+    return update.message.text
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Start command to check if the user exists and display the main menu."""
     telegram_id = update.effective_user.id
-    response = requests.get(f"{API_URL}/user/exist?user_id={telegram_id}")
-
-    if response.status_code == 200 and response.json().get("exists"):
-        keyboard = [
-            [InlineKeyboardButton("Get User Info", callback_data="get_user_info")],
-            [InlineKeyboardButton("Recover Password", callback_data="recover_password")],
-            [InlineKeyboardButton("Orders", callback_data="orders")],
-        ]
+
+    if await user_exists(telegram_id):
+        reply_markup = keyboards.MAIN_MENU
         message_text = "Welcome back! What would you like to do?"
     else:
-        keyboard = [[InlineKeyboardButton("Create Account", callback_data="create_account")]]
+        reply_markup = keyboards.CREATE_ACCOUNT
         message_text = "Hello! Please create an account to get started."
 
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
     if update.message:
         await update.message.reply_text(message_text, reply_markup=reply_markup)
     elif update.callback_query:
@@ -47,15 +104,8 @@ async def orders_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     query = update.callback_query
     await query.answer()
 
-    keyboard = [
-        [InlineKeyboardButton("Create Order", callback_data="create_order")],
-        [InlineKeyboardButton("My Orders", callback_data="my_orders")],
-        [InlineKeyboardButton("Buy Crypto", callback_data="buy_crypto")],
-    ]
     message_text = "What would you like to do with your orders?"
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    await query.edit_message_text(message_text, reply_markup=reply_markup)
+    await query.edit_message_text(message_text, reply_markup=keyboards.ORDERS_MENU)
 
 
 async def create_account_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -77,9 +127,11 @@ async def create_account_password(update: Update, context: ContextTypes.DEFAULT_
     except Exception as e:
         print(f"Failed to delete password message: {e}")
 
-    response = requests.post(f"{API_URL}/user/createAccount/", json={"user_id": telegram_id, "password": password})
+    response = await backend.post("/user/createAccount/", json={"user_id": telegram_id, "password": password})
 
     if response.status_code == 200:
+        user_exists_cache.invalidate(telegram_id)
+
         data = response.json()
         mnemonic_phrase = " ".join(data["mnemonic_phrase"])
         user_address = data["user_address"]
@@ -95,10 +147,7 @@ async def create_account_password(update: Update, context: ContextTypes.DEFAULT_
             f"**Please remember the mnemonic phrase carefully. You will need it to recover your password.**\n"
             f"Click the button below once you've saved your mnemonic phrase securely."
         )
-        keyboard = [[InlineKeyboardButton("I have saved it", callback_data="mnemonic_saved")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await update.message.reply_text(message_text, reply_markup=reply_markup, parse_mode="Markdown")
+        await update.message.reply_text(message_text, reply_markup=keyboards.MNEMONIC_SAVED, parse_mode="Markdown")
         return ConversationHandler.END
     else:
         await update.message.reply_text(
@@ -121,10 +170,9 @@ async def get_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     await query.answer()
 
     telegram_id = update.effective_user.id
-    response = requests.get(f"{API_URL}/user/info?user_id={telegram_id}")
+    user_info, stale = await user_infos.get(telegram_id)
 
-    if response.status_code == 200:
-        user_info = response.json()
+    if user_info is not None:
         user_address = user_info["user_address"]
         wallets = user_info["wallets"]
 
@@ -134,10 +182,9 @@ async def get_user_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             f"🏠 **User Address**: `{user_address}`\n\n"
             f"💼 **Wallets**:\n{wallet_details}"
         )
-        keyboard = [[InlineKeyboardButton("Back to Main Menu", callback_data="main_menu")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.edit_message_text(message_text, parse_mode="Markdown", reply_markup=reply_markup)
+        if stale:
+            message_text += f"\n\n{STALE_DATA_NOTICE}"
+        await query.edit_message_text(message_text, parse_mode="Markdown", reply_markup=keyboards.BACK_TO_MAIN_MENU)
     else:
         await query.edit_message_text("Failed to fetch user info. Please try again later.")
 
@@ -175,8 +222,8 @@ async def recover_password_new_password(update: Update, context: ContextTypes.DE
         return ConversationHandler.END
 
     # Call the recoverPassword API with mnemonic and new password
-    response = requests.post(
-        f"{API_URL}/user/recoverPassword/",
+    response = await backend.post(
+        "/user/recoverPassword/",
         json={"user_id": telegram_id, "mnemonic_phrase": mnemonic_phrase, "new_password": new_password},
     )
 
@@ -202,40 +249,82 @@ async def create_order_start(update: Update, context: ContextTypes.DEFAULT_TYPE)
     query = update.callback_query
     await query.answer()
 
-    await query.edit_message_text("Please enter the 'from_currency' (e.g., BTC):")
+    await query.edit_message_text("Please enter the 'from_currency' (e.g., BTC):", reply_markup=currency_keyboard())
     return ASK_FROM_CURRENCY
 
 
 async def create_order_from_currency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle the 'from_currency' input."""
-    context.user_data["from_currency"] = update.message.text
-    await update.message.delete()
+    try:
+        from_currency = currencies.parse(await read_answer(update, context))
+    except ValidationError as e:
+        await update.effective_message.reply_text(str(e), reply_markup=currency_keyboard())
+        return ASK_FROM_CURRENCY
 
-    await update.message.reply_text("Please enter the 'to_currency' (e.g., ETH):")
+    context.user_data["from_currency"] = from_currency
+    if update.message:
+        await update.message.delete()
+
+    await update.effective_message.reply_text(
+        "Please enter the 'to_currency' (e.g., ETH):", reply_markup=currency_keyboard(exclude=from_currency)
+    )
     return ASK_TO_CURRENCY
 
 
 async def create_order_to_currency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle the 'to_currency' input."""
-    context.user_data["to_currency"] = update.message.text
-    await update.message.delete()
+    from_currency = context.user_data["from_currency"]
+    try:
+        to_currency = currencies.parse(await read_answer(update, context))
+        check_pair(from_currency, to_currency)
+    except ValidationError as e:
+        await update.effective_message.reply_text(str(e), reply_markup=currency_keyboard(exclude=from_currency))
+        return ASK_TO_CURRENCY
 
-    await update.message.reply_text("Please enter the amount to sell (value):")
+    context.user_data["to_currency"] = to_currency
+    if update.message:
+        await update.message.delete()
+
+    await update.effective_message.reply_text("Please enter the amount to sell (value):")
     return ASK_VALUE
 
 
 async def create_order_value(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle the 'value' input."""
-    context.user_data["value"] = float(update.message.text)
+    try:
+        context.user_data["value"] = parse_amount(update.message.text)
+    except ValidationError as e:
+        await update.message.reply_text(str(e))
+        return ASK_VALUE
     await update.message.delete()
 
     await update.message.reply_text("Please enter the exchange rate:")
     return ASK_EXCHANGE_RATE
 
 
+async def submit_order(context: ContextTypes.DEFAULT_TYPE, order_data: dict, idempotency_key: str) -> str:
+    """Create the order and return the message describing the outcome."""
+    response = await backend.post("/order/create", json=order_data, idempotency_key=idempotency_key)
+
+    if response.status_code != 200:
+        return "Failed to create order. Please try again later."
+
+    order_books.invalidate(order_data["from_currency"], order_data["to_currency"])
+    user_infos.invalidate(order_data["user_id"])
+    # Watch the seller's open orders so they are told when this one gets filled
+    context.bot_data.setdefault("watched_users", set()).add(order_data["user_id"])
+    order_watcher.watch(order_data["user_id"])
+    order_response = response.json()
+    return f"Order created successfully: {order_response['msg']}"
+
+
 async def create_order_exchange_rate(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the exchange rate and create the order."""
-    context.user_data["exchange_rate"] = float(update.message.text)
+    try:
+        context.user_data["exchange_rate"] = parse_amount(update.message.text)
+    except ValidationError as e:
+        await update.message.reply_text(str(e))
+        return ASK_EXCHANGE_RATE
     await update.message.delete()
 
     # Send the order data to the API
@@ -246,54 +335,142 @@ async def create_order_exchange_rate(update: Update, context: ContextTypes.DEFAU
         "value": context.user_data["value"],
         "exchange_rate": context.user_data["exchange_rate"],
     }
+    # Sent with every attempt, so a backend deduplicating by it never lets a retried request create the order twice
+    idempotency_key = str(uuid.uuid4())
+
+    if OPTIMISTIC_UI:
+        # Only users with an account get this far, so the result comes with the main menu
+        message = await update.message.reply_text("⏳ Creating your order…")
+        work = submit_order(context, order_data, idempotency_key)
+        context.application.create_task(edit_when_done(message, work, keyboards.MAIN_MENU), update=update)
+        return ConversationHandler.END
 
-    response = requests.post(f"{API_URL}/order/create", json=order_data)
-
-    if response.status_code == 200:
-        order_response = response.json()
-        message_text = f"Order created successfully: {order_response['msg']}"
-    else:
-        message_text = "Failed to create order. Please try again later."
-
-    await update.message.reply_text(message_text)
+    await update.message.reply_text(await submit_order(context, order_data, idempotency_key))
 
     # Return to main menu
     await start(update, context)
     return ConversationHandler.END
 
 
-async def my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Display the user's orders, with a 'Delete' button under each order."""
-    query = update.callback_query
-    await query.answer()
+def format_order(order: dict) -> str:
+    """Format a single order for display in an order list."""
+    return (
+        f"Order ID: {order['order_id']}\n"
+        f"From: {order['from_currency']} → To: {order['to_currency']}\n"
+        f"Amount Sold: {order['amount_sold']} | Amount to Receive: {order['amount_to_receive']}\n"
+        f"Status: {order['status']}"
+    )
+
 
+def render_orders_page(orders: list, page: int, title: str, action: str, action_code: str, page_code: str,
+                       selected: list = None, extra_rows: tuple = ()):
+    """Pack one page of orders into a single message with per-order action buttons and Prev/Next navigation.
+
+    action_code and page_code are the callback actions of the per-order and navigation buttons.
+    When selected is given, the per-order buttons act as checkboxes reflecting it. extra_rows are
+    placed between the order buttons and the navigation row.
+    Returns the message text, the reply markup and the page number actually shown.
+    """
+    page_count = max(1, -(-len(orders) // ORDERS_PAGE_SIZE))
+    page = min(max(page, 0), page_count - 1)
+    page_orders = orders[page * ORDERS_PAGE_SIZE:(page + 1) * ORDERS_PAGE_SIZE]
+
+    message_text = f"{title} (page {page + 1}/{page_count}):\n\n" + "\n\n".join(format_order(o) for o in page_orders)
+
+    keyboard = []
+    for o in page_orders:
+        label = f"{action} #{o['order_id']}"
+        if selected is not None:
+            label = f"{'☑' if o['order_id'] in selected else '☐'} {label}"
+        keyboard.append([keyboards.button(label, action_code, o["order_id"])])
+    keyboard.extend(extra_rows)
+
+    navigation = []
+    if page > 0:
+        navigation.append(keyboards.button("« Prev", page_code, page - 1))
+    if page < page_count - 1:
+        navigation.append(keyboards.button("Next »", page_code, page + 1))
+    if navigation:
+        keyboard.append(navigation)
+    keyboard.append(keyboards.BACK_TO_MAIN_MENU_ROW)
+
+    return message_text, InlineKeyboardMarkup(keyboard), page
+
+
+def format_bulk_results(results: dict, success: str, failure: str) -> str:
+    """Summarize per-order results of a bulk operation in one message."""
+    succeeded = [f"#{order_id}" for order_id, ok in results.items() if ok]
+    failed = [f"#{order_id}" for order_id, ok in results.items() if not ok]
+    lines = []
+    if succeeded:
+        lines.append(f"{success}: {', '.join(succeeded)}")
+    if failed:
+        lines.append(f"{failure}: {', '.join(failed)}")
+    return "\n".join(lines)
+
+
+async def show_my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int, notice: str = None) -> None:
+    """Render a page of the user's orders into the current message.
+
+    While orders are being selected the list fetched on entering selection is reused, so checking
+    a box or paging doesn't ask the backend again.
+    """
+    query = update.callback_query
     telegram_id = update.effective_user.id
-    response = requests.get(f"{API_URL}/user/orders?user_id={telegram_id}")
+    selected = context.user_data.get("selected_orders")
+
+    orders = context.user_data.get("selectable_orders") if selected is not None else None
+    if orders is None:
+        response = await backend.get("/user/orders", params={"user_id": telegram_id})
+
+        if response.status_code != 200:
+            await query.edit_message_text("Failed to fetch your orders. Please try again later.")
+            return
 
-    if response.status_code == 200:
         orders = response.json()
-        if orders:
-            for order in orders:
-                message_text = (
-                    f"Order ID: {order['order_id']}\n"
-                    f"From: {order['from_currency']} → To: {order['to_currency']}\n"
-                    f"Amount Sold: {order['amount_sold']} | Amount to Receive: {order['amount_to_receive']}\n"
-                    f"Status: {order['status']}\n\n"
-                )
-                keyboard = [
-                    [InlineKeyboardButton("Delete", callback_data=f"delete_order_{order['order_id']}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await query.message.reply_text(message_text, reply_markup=reply_markup)
-
-            keyboard = [[InlineKeyboardButton("Back to Main Menu", callback_data="main_menu")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text("Here are your orders:", reply_markup=reply_markup)
-        else:
-            await query.edit_message_text("You have no orders yet.")
-            await orders_menu(update, context)
+        if backend.is_stale(response):
+            notice = f"{notice}\n\n{STALE_DATA_NOTICE}" if notice else STALE_DATA_NOTICE
+        if selected is not None:
+            context.user_data["selectable_orders"] = orders
+
+    if not orders:
+        message_text = "You have no orders yet."
+        if notice:
+            message_text = f"{notice}\n\n{message_text}"
+        await query.edit_message_text(message_text, reply_markup=keyboards.ORDERS_MENU)
+        return
+
+    if selected is None:
+        message_text, reply_markup, page = render_orders_page(
+            orders, page, "Here are your orders", "Delete", callbacks.DELETE_ORDER, callbacks.MY_ORDERS,
+            extra_rows=keyboards.MY_ORDERS_ACTIONS,
+        )
     else:
-        await query.edit_message_text("Failed to fetch your orders. Please try again later.")
+        message_text, reply_markup, page = render_orders_page(
+            orders, page, "Select the orders to delete", "Order", callbacks.TOGGLE_ORDER, callbacks.MY_ORDERS,
+            selected=selected,
+            extra_rows=[[
+                keyboards.button(f"Delete Selected ({len(selected)})", callbacks.BULK_DELETE_ORDERS),
+                keyboards.button("Cancel", callbacks.CANCEL_SELECT_ORDERS),
+            ]],
+        )
+    context.user_data["my_orders_page"] = page
+    if notice:
+        message_text = f"{notice}\n\n{message_text}"
+    await query.edit_message_text(message_text, reply_markup=reply_markup)
+
+
+async def my_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Display a page of the user's orders in one message, with a 'Delete' button per order."""
+    query = update.callback_query
+    await query.answer()
+
+    # Opening the list from the orders menu starts without a selection; paging keeps it
+    if not context.args:
+        context.user_data.pop("selected_orders", None)
+        context.user_data.pop("selectable_orders", None)
+
+    await show_my_orders(update, context, context.args[0] if context.args else 0)
 
 
 async def delete_order(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -301,18 +478,95 @@ async def delete_order(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     query = update.callback_query
     await query.answer()
 
-    callback_data = query.data
-    order_id = int(callback_data.split("_")[-1])
+    order_id = context.args[0]
+    idempotency_key = str(uuid.uuid4())
+
+    if OPTIMISTIC_UI:
+        await query.edit_message_text(f"⏳ Deleting Order {order_id}…")
+        context.application.create_task(
+            delete_order_and_refresh(update, context, order_id, idempotency_key), update=update
+        )
+        return
+
+    await delete_order_and_refresh(update, context, order_id, idempotency_key)
+
 
+async def delete_order_and_refresh(update: Update, context: ContextTypes.DEFAULT_TYPE, order_id: int,
+                                   idempotency_key: str) -> None:
+    """Delete the order and re-render the user's order list with the outcome."""
     telegram_id = update.effective_user.id
 
-    response = requests.delete(f"{API_URL}/order/delete?order_id={order_id}&user_id={telegram_id}")
+    response = await backend.delete(
+        "/order/delete", params={"order_id": order_id, "user_id": telegram_id}, idempotency_key=idempotency_key
+    )
 
     if response.status_code == 200:
-        await query.edit_message_text(f"Order {order_id} has been deleted successfully.")
+        order_books.invalidate_order(order_id)
+        order_watcher.forget_order(telegram_id, order_id)
+        user_infos.invalidate(telegram_id)
+        notice = f"Order {order_id} has been deleted successfully."
+    else:
+        notice = f"Failed to delete Order {order_id}. Please try again later."
+
+    await show_my_orders(update, context, context.user_data.get("my_orders_page", 0), notice)
+
+
+async def select_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Switch the user's order list to checkbox selection for bulk deletion."""
+    query = update.callback_query
+    await query.answer()
+
+    context.user_data["selected_orders"] = []
+    context.user_data.pop("selectable_orders", None)
+    await show_my_orders(update, context, context.user_data.get("my_orders_page", 0))
+
+
+async def cancel_select_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Leave checkbox selection and go back to the regular order list."""
+    query = update.callback_query
+    await query.answer()
+
+    context.user_data.pop("selected_orders", None)
+    context.user_data.pop("selectable_orders", None)
+    await show_my_orders(update, context, context.user_data.get("my_orders_page", 0))
+
+
+async def toggle_order(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Check or uncheck one of the user's orders for bulk deletion."""
+    query = update.callback_query
+    await query.answer()
 
+    order_id = context.args[0]
+    selected = context.user_data.setdefault("selected_orders", [])
+    if order_id in selected:
+        selected.remove(order_id)
     else:
-        await query.edit_message_text(f"Failed to delete Order {order_id}. Please try again later.")
+        selected.append(order_id)
+
+    await show_my_orders(update, context, context.user_data.get("my_orders_page", 0))
+
+
+async def bulk_delete_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Delete all selected orders in one batch and report the result of each."""
+    query = update.callback_query
+    await query.answer()
+
+    selected = context.user_data.get("selected_orders")
+    if not selected:
+        await show_my_orders(update, context, context.user_data.get("my_orders_page", 0), "No orders selected.")
+        return
+
+    results = await batch.delete_orders(update.effective_user.id, selected)
+    for order_id, deleted in results.items():
+        if deleted:
+            order_books.invalidate_order(order_id)
+            order_watcher.forget_order(update.effective_user.id, order_id)
+            user_infos.invalidate(update.effective_user.id)
+
+    context.user_data.pop("selected_orders", None)
+    context.user_data.pop("selectable_orders", None)
+    notice = format_bulk_results(results, "Deleted", "Failed to delete")
+    await show_my_orders(update, context, context.user_data.get("my_orders_page", 0), notice)
 
 
 async def buy_crypto_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -321,81 +575,267 @@ async def buy_crypto_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     await query.answer()
 
     # Ask for the currency to buy
-    await query.edit_message_text("Which currency would you like to buy?")
+    await query.edit_message_text("Which currency would you like to buy?", reply_markup=currency_keyboard())
 
     return ASK_BUY_CURRENCY
 
 
 async def buy_crypto_buy_currency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Ask for the currency to sell."""
-    buy_currency = update.message.text
+    try:
+        buy_currency = currencies.parse(await read_answer(update, context))
+    except ValidationError as e:
+        await update.effective_message.reply_text(str(e), reply_markup=currency_keyboard())
+        return ASK_BUY_CURRENCY
     context.user_data["buy_currency"] = buy_currency
 
     # Ask for the currency to sell
-    await update.message.reply_text("Which currency would you like to sell?")
+    await update.effective_message.reply_text(
+        "Which currency would you like to sell?", reply_markup=currency_keyboard(exclude=buy_currency)
+    )
 
     return ASK_SELL_CURRENCY
 
 
+async def fetch_buy_orders(context: ContextTypes.DEFAULT_TYPE, user_id: int):
+    """Fetch the orders the user can buy for the currency pair stored in user_data, or None on failure."""
+    return await order_books.get_for_user(
+        context.user_data["buy_currency"], context.user_data["sell_currency"], user_id
+    )
+
+
+def render_buy_orders(context: ContextTypes.DEFAULT_TYPE, orders: list, page: int):
+    """Render a page of the orders available to buy, honouring the user's bulk-buy selection."""
+    selected = context.user_data.get("selected_buy_orders")
+    if selected is None:
+        return render_orders_page(
+            orders, page, "Here are the orders that you can buy", "Buy",
+            callbacks.BUY_ORDER, callbacks.BUY_ORDERS_PAGE,
+            extra_rows=keyboards.buy_orders_actions(
+                context.user_data["buy_currency"], context.user_data["sell_currency"]
+            ),
+        )
+    return render_orders_page(
+        orders, page, "Select the orders to buy in full", "Order",
+        callbacks.TOGGLE_BUY_ORDER, callbacks.BUY_ORDERS_PAGE, selected=selected,
+        extra_rows=[[
+            keyboards.button(f"Buy Selected ({len(selected)})", callbacks.BULK_BUY_ORDERS),
+            keyboards.button("Cancel", callbacks.CANCEL_SELECT_BUY_ORDERS),
+        ]],
+    )
+
+
+async def show_buy_orders(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int, notice: str = None) -> None:
+    """Render a page of the orders available to buy into the current message."""
+    query = update.callback_query
+
+    if "buy_currency" not in context.user_data or "sell_currency" not in context.user_data:
+        await query.edit_message_text("This list has expired.", reply_markup=keyboards.ORDERS_MENU)
+        return
+
+    orders = await fetch_buy_orders(context, update.effective_user.id)
+
+    if orders is None:
+        await query.edit_message_text("Failed to fetch orders. Please try again later.")
+        return
+
+    if orders:
+        message_text, reply_markup, page = render_buy_orders(context, orders, page)
+        context.user_data["buy_orders_page"] = page
+    else:
+        message_text, reply_markup = "No more orders available to buy.", keyboards.ORDERS_MENU
+    if notice:
+        message_text = f"{notice}\n\n{message_text}"
+    await query.edit_message_text(message_text, reply_markup=reply_markup)
+
+
 async def buy_crypto_sell_currency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    """Show available orders as separate messages based on the selected currencies and display a main menu button at the end."""
-    sell_currency = update.message.text
+    """Show the first page of available orders for the selected currencies in a single message."""
     buy_currency = context.user_data["buy_currency"]
+    try:
+        sell_currency = currencies.parse(await read_answer(update, context))
+        check_pair(buy_currency, sell_currency)
+    except ValidationError as e:
+        await update.effective_message.reply_text(str(e), reply_markup=currency_keyboard(exclude=buy_currency))
+        return ASK_SELL_CURRENCY
     context.user_data["sell_currency"] = sell_currency
-    user_id = update.effective_user.id
+    context.user_data.pop("selected_buy_orders", None)
 
-    response = requests.get(f"{API_URL}/orders/list?user_id={user_id}&currency_to_buy={buy_currency}&currency_to_sell={sell_currency}")
+    orders = await fetch_buy_orders(context, update.effective_user.id)
 
-    if response.status_code == 200:
-        orders = response.json()
-        if orders:
-            await update.message.reply_text("Here are the orders that you can buy:")
-
-            for order in orders:
-                order_message = (
-                    f"Order ID: {order['order_id']}\n"
-                    f"From: {order['from_currency']} → To: {order['to_currency']}\n"
-                    f"Amount Sold: {order['amount_sold']} | Amount to Receive: {order['amount_to_receive']}\n"
-                    f"Status: {order['status']}\n"
-                )
-                keyboard = [
-                    [InlineKeyboardButton("Buy", callback_data=f"buy_order_{order['order_id']}")]
-                ]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(order_message, reply_markup=reply_markup)
-            keyboard = [[InlineKeyboardButton("Back to Main Menu", callback_data="main_menu")]]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await update.message.reply_text("Click the button below to go back to the main menu.", reply_markup=reply_markup)
-        else:
-            await update.message.reply_text(f"No available orders to buy {buy_currency} with {sell_currency}.")
-            await orders_menu(update, context)
+    if orders is None:
+        await update.effective_message.reply_text("Failed to fetch orders. Please try again later.")
+    elif orders:
+        message_text, reply_markup, page = render_buy_orders(context, orders, 0)
+        context.user_data["buy_orders_page"] = page
+        await update.effective_message.reply_text(message_text, reply_markup=reply_markup)
     else:
-        await update.message.reply_text("Failed to fetch orders. Please try again later.")
+        await update.effective_message.reply_text(
+            f"No available orders to buy {buy_currency} with {sell_currency}.",
+            reply_markup=keyboards.notify_me_or_orders_menu(buy_currency, sell_currency),
+        )
     return ConversationHandler.END
 
 
+async def buy_orders_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle Prev/Next navigation through the list of orders available to buy."""
+    query = update.callback_query
+    await query.answer()
+
+    await show_buy_orders(update, context, context.args[0] if context.args else 0)
+
+
+async def select_buy_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Switch the list of orders available to buy to checkbox selection for a bulk buy."""
+    query = update.callback_query
+    await query.answer()
+
+    context.user_data["selected_buy_orders"] = []
+    await show_buy_orders(update, context, context.user_data.get("buy_orders_page", 0))
+
+
+async def cancel_select_buy_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Leave checkbox selection and go back to the regular list of orders available to buy."""
+    query = update.callback_query
+    await query.answer()
+
+    context.user_data.pop("selected_buy_orders", None)
+    await show_buy_orders(update, context, context.user_data.get("buy_orders_page", 0))
+
+
+async def toggle_buy_order(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Check or uncheck an order for the bulk buy."""
+    query = update.callback_query
+    await query.answer()
+
+    order_id = context.args[0]
+    selected = context.user_data.setdefault("selected_buy_orders", [])
+    if order_id in selected:
+        selected.remove(order_id)
+    else:
+        selected.append(order_id)
+
+    await show_buy_orders(update, context, context.user_data.get("buy_orders_page", 0))
+
+
+async def bulk_buy_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Buy every selected order in full in one batch and report the result of each."""
+    query = update.callback_query
+    await query.answer()
+
+    selected = context.user_data.get("selected_buy_orders")
+    if not selected:
+        await show_buy_orders(update, context, context.user_data.get("buy_orders_page", 0), "No orders selected.")
+        return
+
+    buy_currency = context.user_data["buy_currency"]
+    sell_currency = context.user_data["sell_currency"]
+    orders = await fetch_buy_orders(context, update.effective_user.id) or []
+    amounts = {order["order_id"]: order["amount_sold"] for order in orders if order["order_id"] in selected}
+
+    results = await batch.buy_orders(update.effective_user.id, amounts) if amounts else {}
+    order_books.invalidate(buy_currency, sell_currency)
+    # Sellers are only known when the backend names them, see submit_purchase
+    sellers = {order["order_id"]: order.get("user_id") for order in orders}
+    lines = []
+    for order_id, result in results.items():
+        if result is None:
+            continue
+        if result["amount_to_receive"] is None or result["amount_paid"] is None:
+            # The batch endpoint didn't report the amounts, so the cached wallets can't be patched
+            user_infos.invalidate(update.effective_user.id)
+            lines.append(f"✅ #{order_id}: bought")
+        else:
+            user_infos.apply_purchase(
+                update.effective_user.id,
+                buy_currency, result["amount_to_receive"], sell_currency, result["amount_paid"],
+            )
+            lines.append(
+                f"✅ #{order_id}: bought {result['amount_to_receive']} {buy_currency} "
+                f"for {result['amount_paid']} {sell_currency}"
+            )
+        if sellers.get(order_id) is not None:
+            user_infos.invalidate(sellers[order_id])
+    context.user_data.pop("selected_buy_orders", None)
+
+    failed = [order_id for order_id in selected if results.get(order_id) is None]
+    if failed:
+        lines.append(f"❌ Failed to buy: {', '.join(f'#{order_id}' for order_id in failed)}")
+
+    await query.edit_message_text("\n".join(lines), reply_markup=keyboards.BACK_TO_MAIN_MENU)
+
+
 async def buy_order(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Handle the 'Buy' button press to ask the user for the amount to buy."""
     query = update.callback_query
     await query.answer()
 
-    # Extract the order ID from the callback data
-    order_id = int(query.data.split("_")[2])  # "buy_order_1" -> 1
+    order_id, *pair = context.args
     context.user_data["order_id"] = order_id  # Store the selected order ID
 
-    # Ask the user to enter the amount to buy
-    await query.message.reply_text("Please enter the amount you'd like to buy:")
+    # Buy buttons in notifications carry the pair, as they are pressed outside the Buy Crypto flow
+    # that sets it. Buttons in older notifications don't, so the pair comes from the cached order
+    order = order_books.find(order_id)
+    if len(pair) == 2:
+        context.user_data["buy_currency"], context.user_data["sell_currency"] = pair
+    elif order is not None:
+        context.user_data["buy_currency"] = order["from_currency"]
+        context.user_data["sell_currency"] = order["to_currency"]
+    elif "buy_currency" not in context.user_data or "sell_currency" not in context.user_data:
+        await query.message.reply_text(
+            "This order is no longer available. Please find it again via Buy Crypto.",
+            reply_markup=keyboards.BACK_TO_MAIN_MENU,
+        )
+        return ConversationHandler.END
+
+    # Keep what the purchase needs to know about the order; the cached snapshot expires while the user types
+    if order is None:
+        orders = await fetch_buy_orders(context, update.effective_user.id) or []
+        order = next((order for order in orders if order["order_id"] == order_id), None)
+    context.user_data["order_rate"] = order_rate(order) if order is not None else None
+    context.user_data["order_seller"] = order.get("user_id") if order is not None else None
+
+    # Ask the user to enter the amount to buy, showing their balance if it is cached
+    message_text = "Please enter the amount you'd like to buy:"
+    balance = user_infos.balance(update.effective_user.id, context.user_data.get("sell_currency"))
+    if balance is not None:
+        message_text += f"\n\nYou have {balance} {context.user_data['sell_currency']} available."
+    await query.message.reply_text(message_text)
 
     return AMOUNT_TO_BUY
 
 
+async def submit_purchase(buy_data: dict, buy_currency: str, sell_currency: str, idempotency_key: str,
+                          seller: int = None) -> str:
+    """Buy from the order and return the message describing the outcome."""
+    response = await backend.post("/orders/buy", json=buy_data, idempotency_key=idempotency_key)
+
+    if response.status_code != 200:
+        return "❌ Failed to process your purchase. Please try again later."
+
+    order_books.invalidate(buy_currency, sell_currency)
+    buy_response = response.json()
+    amount_received = buy_response["amount_to_receive"]
+    amount_paid = buy_response["amount_paid"]
+
+    user_infos.apply_purchase(buy_data["user_id"], buy_currency, amount_received, sell_currency, amount_paid)
+    # Orders don't always name their seller; then the order watcher drops the seller's entry when it
+    # sees the fill, or the entry expires after USER_INFO_MAX_AGE
+    if seller is not None:
+        user_infos.invalidate(seller)
+
+    return (
+        f"✅ Your purchase was successful!\n\n"
+        f"You bought {amount_received} {buy_currency} for {amount_paid} {sell_currency}."
+    )
+
+
 async def process_amount_to_buy(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Process the amount entered by the user and make the buy request."""
-    amount_to_buy = update.message.text
     try:
-        amount_to_buy = float(amount_to_buy)
-    except ValueError:
-        await update.message.reply_text("Please enter a valid number for the amount to buy.")
+        amount_to_buy = parse_amount(update.message.text)
+    except ValidationError as e:
+        await update.message.reply_text(str(e))
         return AMOUNT_TO_BUY
 
     order_id = context.user_data["order_id"]
@@ -403,78 +843,111 @@ async def process_amount_to_buy(update: Update, context: ContextTypes.DEFAULT_TY
     buy_currency = context.user_data["buy_currency"]
     sell_currency = context.user_data["sell_currency"]
 
+    # Reject amounts the user can't afford when both the order's rate and their balance are known
+    rate = context.user_data.get("order_rate")
+    balance = user_infos.balance(user_id, sell_currency)
+    if rate is not None and balance is not None:
+        cost = amount_to_buy * rate
+        if cost > balance:
+            await update.message.reply_text(
+                f"Buying {amount_to_buy} {buy_currency} costs {cost} {sell_currency}, "
+                f"but you only have {balance} {sell_currency}. Please enter a smaller amount:"
+            )
+            return AMOUNT_TO_BUY
+
     buy_data = {
         "user_id": user_id,
         "order_id": order_id,
         "amount_to_buy": amount_to_buy
     }
-
-    response = requests.post(f"{API_URL}/orders/buy", json=buy_data)
-
-    if response.status_code == 200:
-        buy_response = response.json()
-        amount_received = buy_response["amount_to_receive"]
-        amount_paid = buy_response["amount_paid"]
-
-        message_text = (
-            f"✅ Your purchase was successful!\n\n"
-            f"You bought {amount_received} {buy_currency} for {amount_paid} {sell_currency}."
+    seller = context.user_data.get("order_seller")
+    # Sent with every attempt, so a backend deduplicating by it never lets a retried request buy twice
+    idempotency_key = str(uuid.uuid4())
+
+    if OPTIMISTIC_UI:
+        message = await update.message.reply_text("⏳ Processing your purchase…")
+        work = submit_purchase(buy_data, buy_currency, sell_currency, idempotency_key, seller)
+        context.application.create_task(
+            edit_when_done(message, work, keyboards.BACK_TO_MAIN_MENU), update=update
         )
-    else:
-        message_text = "❌ Failed to process your purchase. Please try again later."
+        return ConversationHandler.END
 
-    await update.message.reply_text(message_text)
+    await update.message.reply_text(
+        await submit_purchase(buy_data, buy_currency, sell_currency, idempotency_key, seller)
+    )
 
-    keyboard = [[InlineKeyboardButton("Back to Main Menu", callback_data="main_menu")]]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text("Click the button below to go back to the main menu.", reply_markup=reply_markup)
+    await update.message.reply_text(
+        "Click the button below to go back to the main menu.", reply_markup=keyboards.BACK_TO_MAIN_MENU
+    )
 
     return ConversationHandler.END
 
 
 # Conversation handler for creating account
 create_account_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(create_account_start, pattern="^create_account$")],
+    entry_points=[CallbackRouter({callbacks.CREATE_ACCOUNT: create_account_start})],
     states={
         ASK_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, create_account_password)],
     },
     fallbacks=[],
+    name="create_account",
+    persistent=bool(PERSISTENCE_PATH),
 )
 
 # Conversation handler for recovering password
 recover_password_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(recover_password_start, pattern="^recover_password$")],
+    entry_points=[CallbackRouter({callbacks.RECOVER_PASSWORD: recover_password_start})],
     states={
         ASK_MNEMONIC: [MessageHandler(filters.TEXT & ~filters.COMMAND, recover_password_mnemonic)],
         ASK_NEW_PASSWORD: [MessageHandler(filters.TEXT & ~filters.COMMAND, recover_password_new_password)],
     },
     fallbacks=[],
+    name="recover_password",
+    persistent=bool(PERSISTENCE_PATH),
 )
 
 create_order_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(create_order_start, pattern="^create_order$")],
+    entry_points=[CallbackRouter({callbacks.CREATE_ORDER: create_order_start})],
     states={
-        ASK_FROM_CURRENCY: [MessageHandler(filters.TEXT & ~filters.COMMAND, create_order_from_currency)],
-        ASK_TO_CURRENCY: [MessageHandler(filters.TEXT & ~filters.COMMAND, create_order_to_currency)],
+        ASK_FROM_CURRENCY: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, create_order_from_currency),
+            CallbackRouter({callbacks.CHOOSE_CURRENCY: create_order_from_currency}),
+        ],
+        ASK_TO_CURRENCY: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, create_order_to_currency),
+            CallbackRouter({callbacks.CHOOSE_CURRENCY: create_order_to_currency}),
+        ],
         ASK_VALUE: [MessageHandler(filters.TEXT & ~filters.COMMAND, create_order_value)],
         ASK_EXCHANGE_RATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, create_order_exchange_rate)],
     },
     fallbacks=[],
+    name="create_order",
+    persistent=bool(PERSISTENCE_PATH),
 )
 
 buy_crypto_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(buy_crypto_start, pattern="^buy_crypto$")],
+    entry_points=[CallbackRouter({callbacks.BUY_CRYPTO: buy_crypto_start})],
     states={
-        ASK_BUY_CURRENCY: [MessageHandler(filters.TEXT & ~filters.COMMAND, buy_crypto_buy_currency)],
-        ASK_SELL_CURRENCY: [MessageHandler(filters.TEXT & ~filters.COMMAND, buy_crypto_sell_currency)],
+        ASK_BUY_CURRENCY: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, buy_crypto_buy_currency),
+            CallbackRouter({callbacks.CHOOSE_CURRENCY: buy_crypto_buy_currency}),
+        ],
+        ASK_SELL_CURRENCY: [
+            MessageHandler(filters.TEXT & ~filters.COMMAND, buy_crypto_sell_currency),
+            CallbackRouter({callbacks.CHOOSE_CURRENCY: buy_crypto_sell_currency}),
+        ],
     },
     fallbacks=[],
+    name="buy_crypto",
+    persistent=bool(PERSISTENCE_PATH),
 )
 
 buy_order_handler = ConversationHandler(
-    entry_points=[CallbackQueryHandler(buy_order, pattern=r"^buy_order_\d+$")],
+    entry_points=[CallbackRouter({callbacks.BUY_ORDER: buy_order})],
     states={
         AMOUNT_TO_BUY: [MessageHandler(filters.TEXT & ~filters.COMMAND, process_amount_to_buy)],
     },
     fallbacks=[],
+    name="buy_order",
+    persistent=bool(PERSISTENCE_PATH),
 )
@@ -0,0 +1,62 @@
+import functools
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+import callbacks
+
+
+def button(text: str, code: str, *args) -> InlineKeyboardButton:
+    """Build an inline button that triggers the given callback action."""
+    return InlineKeyboardButton(text, callback_data=callbacks.encode(code, *args))
+
+
+# Keyboards that never change are built once; Telegram objects are frozen, so sharing them is safe
+MAIN_MENU = InlineKeyboardMarkup([
+    [button("Get User Info", callbacks.GET_USER_INFO)],
+    [button("Recover Password", callbacks.RECOVER_PASSWORD)],
+    [button("Orders", callbacks.ORDERS_MENU)],
+])
+CREATE_ACCOUNT = InlineKeyboardMarkup([[button("Create Account", callbacks.CREATE_ACCOUNT)]])
+MNEMONIC_SAVED = InlineKeyboardMarkup([[button("I have saved it", callbacks.MNEMONIC_SAVED)]])
+ORDERS_MENU = InlineKeyboardMarkup([
+    [button("Create Order", callbacks.CREATE_ORDER)],
+    [button("My Orders", callbacks.MY_ORDERS)],
+    [button("Buy Crypto", callbacks.BUY_CRYPTO)],
+])
+
+BACK_TO_MAIN_MENU_ROW = (button("Back to Main Menu", callbacks.MAIN_MENU),)
+BACK_TO_MAIN_MENU = InlineKeyboardMarkup([BACK_TO_MAIN_MENU_ROW])
+
+# Currency choice buttons per row
+CURRENCIES_PER_ROW = 4
+
+
+@functools.lru_cache(maxsize=256)
+def currency_choices(currencies: tuple) -> InlineKeyboardMarkup:
+    """Build a keyboard with one choice button per currency, once per distinct list of currencies."""
+    buttons = [button(currency, callbacks.CHOOSE_CURRENCY, currency) for currency in currencies]
+    return InlineKeyboardMarkup(
+        [buttons[start:start + CURRENCIES_PER_ROW] for start in range(0, len(buttons), CURRENCIES_PER_ROW)]
+    )
+
+
+# Rows placed under order lists when nothing is being selected
+MY_ORDERS_ACTIONS = ((button("Select Multiple", callbacks.SELECT_ORDERS),),)
+
+
+# The Notify Me buttons carry their pair, as subscriptions are handled by the leader shard (see sharding.py)
+
+@functools.lru_cache(maxsize=256)
+def buy_orders_actions(buy_currency: str, sell_currency: str) -> tuple:
+    return ((
+        button("Select Multiple", callbacks.SELECT_BUY_ORDERS),
+        button("🔔 Notify Me", callbacks.SUBSCRIBE_PAIR, buy_currency, sell_currency),
+    ),)
+
+
+@functools.lru_cache(maxsize=256)
+def notify_me_or_orders_menu(buy_currency: str, sell_currency: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [button("🔔 Notify Me of New Orders", callbacks.SUBSCRIBE_PAIR, buy_currency, sell_currency)],
+        *ORDERS_MENU.inline_keyboard,
+    ])
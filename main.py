@@ -1,31 +1,173 @@
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler
+import functools
+
+from telegram.ext import Application, CommandHandler
 from handlers import create_account_handler, recover_password_handler, start, get_user_info, main_menu, mnemonic_saved, \
-    orders_menu, create_order_handler, my_orders, delete_order, buy_crypto_handler, buy_order_handler
+    orders_menu, create_order_handler, my_orders, delete_order, buy_crypto_handler, buy_order_handler, buy_orders_page, \
+    select_orders, cancel_select_orders, toggle_order, bulk_delete_orders, select_buy_orders, cancel_select_buy_orders, \
+    toggle_buy_order, bulk_buy_orders, user_exists_cache
 
-from utils import TELEGRAM_TOKEN
+import backend
+import callbacks
+import metrics
+import sharding
+from callbacks import CallbackRouter
+from orderbook import order_books
+from persistence import SQLitePersistence
+from scheduler import OutboundScheduler
+from subscriptions import poll_subscriptions, subscribe_pair, unsubscribe_pair, subscribe_command, unsubscribe_command
+from update_processor import PerUserUpdateProcessor
+from userinfo import user_infos
+from validation import refresh_currencies
+from watcher import order_watcher, poll_order_status
+from utils import TELEGRAM_TOKEN, TELEGRAM_API_URL, CONCURRENT_UPDATES, PERSISTENCE_PATH, PERSISTENCE_UPDATE_INTERVAL, \
+    PERSISTENCE_WRITE_DELAY, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, \
+    WEBHOOK_MAX_CONNECTIONS, METRICS_HOST, METRICS_PORT, METRICS_LOG_INTERVAL, TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, \
+    TELEGRAM_CHAT_BURST, TELEGRAM_GROUP_RATE, TELEGRAM_MAX_RETRIES, SUBSCRIPTION_POLL_INTERVAL, WATCH_POLL_INTERVAL, \
+    CURRENCY_REFRESH_INTERVAL, SHARDS, RUN_SHARED_JOBS
 
 
-def main():
-    """Main entry point for the bot."""
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+async def post_init(application: Application, shard: int = 0) -> None:
+    """Start the metrics endpoint (one port per shard) and periodic metrics logging once the bot is initialized."""
+    await metrics.start(METRICS_HOST, METRICS_PORT + shard if METRICS_PORT else 0, METRICS_LOG_INTERVAL)
+
+
+async def post_shutdown(application: Application) -> None:
+    """Release shared resources once the bot has stopped."""
+    await metrics.stop()
+    await backend.close()
+
+
+def register_gauges() -> None:
+    """Expose cache and request-coalescing counters alongside the latency metrics."""
+    metrics.gauges.update({
+        "user_exists_cache_hits": lambda: user_exists_cache.hits,
+        "user_exists_cache_misses": lambda: user_exists_cache.misses,
+        "order_book_cache_hits": lambda: order_books.stats()["hits"],
+        "order_book_cache_misses": lambda: order_books.stats()["misses"],
+        "order_book_fetches": lambda: order_books.fetches,
+        "user_info_cache_hits": lambda: user_infos.stats()["hits"],
+        "user_info_cache_misses": lambda: user_infos.stats()["misses"],
+        "backend_single_flight_sent": lambda: backend.single_flight_stats["sent"],
+        "backend_single_flight_collapsed": lambda: backend.single_flight_stats["collapsed"],
+        "order_watcher_orders": lambda: order_watcher.order_count,
+    })
+
+
+def build_application(shard: int = None) -> Application:
+    """Build the fully configured application with all handlers and background jobs registered.
+
+    A shard's application has no updater of its own, as the shard router feeds it updates, and
+    keeps its persisted state in a file of its own. Shards split the global Bot API rate between
+    them, and only the leader shard polls subscriptions and refreshes the currencies. Instances
+    with RUN_SHARED_JOBS off leave subscriptions and order fills to the one that has it on.
+    """
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .request(metrics.InstrumentedRequest(connection_pool_size=256))
+        .get_updates_request(metrics.InstrumentedRequest())
+        .rate_limiter(
+            OutboundScheduler(
+                overall_rate=TELEGRAM_GLOBAL_RATE if shard is None else TELEGRAM_GLOBAL_RATE / SHARDS,
+                chat_rate=TELEGRAM_CHAT_RATE,
+                chat_burst=TELEGRAM_CHAT_BURST,
+                group_rate=TELEGRAM_GROUP_RATE,
+                max_retries=TELEGRAM_MAX_RETRIES,
+            )
+        )
+        .post_init(post_init if shard is None else functools.partial(post_init, shard=shard))
+        .post_shutdown(post_shutdown)
+    )
+    if TELEGRAM_API_URL:
+        # Lets the bot talk to a local Bot API server, e.g. a fake one used for load testing
+        builder = builder.base_url(f"{TELEGRAM_API_URL}/bot").base_file_url(f"{TELEGRAM_API_URL}/file/bot")
+    if CONCURRENT_UPDATES > 0:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(CONCURRENT_UPDATES))
+    if shard is not None:
+        builder = builder.updater(None)
+    if PERSISTENCE_PATH:
+        builder = builder.persistence(
+            SQLitePersistence(
+                PERSISTENCE_PATH if shard is None else f"{PERSISTENCE_PATH}.{shard}",
+                update_interval=PERSISTENCE_UPDATE_INTERVAL,
+                write_delay=PERSISTENCE_WRITE_DELAY,
+            )
+        )
+    application = builder.build()
 
     # Add handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(create_account_handler)
-    application.add_handler(CallbackQueryHandler(get_user_info, pattern="^get_user_info$"))
     application.add_handler(recover_password_handler)
-    application.add_handler(CallbackQueryHandler(main_menu, pattern="^main_menu$"))
-    application.add_handler(CallbackQueryHandler(mnemonic_saved, pattern="^mnemonic_saved$"))
-
-    application.add_handler(CallbackQueryHandler(orders_menu, pattern="^orders$"))
     application.add_handler(create_order_handler)
-    application.add_handler(CallbackQueryHandler(my_orders, pattern="^my_orders$"))
-    application.add_handler(CallbackQueryHandler(delete_order, pattern="^delete_order_"))
-
     application.add_handler(buy_crypto_handler)
     application.add_handler(buy_order_handler)
+    application.add_handler(CommandHandler("subscribe", subscribe_command))
+    application.add_handler(CommandHandler("unsubscribe", unsubscribe_command))
+
+    # All other buttons go through one router, which picks the callback by the action code in the callback data
+    application.add_handler(CallbackRouter({
+        callbacks.GET_USER_INFO: get_user_info,
+        callbacks.MAIN_MENU: main_menu,
+        callbacks.MNEMONIC_SAVED: mnemonic_saved,
+        callbacks.ORDERS_MENU: orders_menu,
+        callbacks.MY_ORDERS: my_orders,
+        callbacks.DELETE_ORDER: delete_order,
+        callbacks.SELECT_ORDERS: select_orders,
+        callbacks.CANCEL_SELECT_ORDERS: cancel_select_orders,
+        callbacks.TOGGLE_ORDER: toggle_order,
+        callbacks.BULK_DELETE_ORDERS: bulk_delete_orders,
+        callbacks.BUY_ORDERS_PAGE: buy_orders_page,
+        callbacks.SELECT_BUY_ORDERS: select_buy_orders,
+        callbacks.CANCEL_SELECT_BUY_ORDERS: cancel_select_buy_orders,
+        callbacks.TOGGLE_BUY_ORDER: toggle_buy_order,
+        callbacks.BULK_BUY_ORDERS: bulk_buy_orders,
+        callbacks.SUBSCRIBE_PAIR: subscribe_pair,
+        callbacks.UNSUBSCRIBE_PAIR: unsubscribe_pair,
+    }))
+
+    # One shared job polls every subscribed pair, so backend load grows with pairs rather than subscribers
+    if application.job_queue is not None:
+        if RUN_SHARED_JOBS and shard in (None, sharding.LEADER):
+            application.job_queue.run_repeating(poll_subscriptions, interval=SUBSCRIPTION_POLL_INTERVAL)
+        if RUN_SHARED_JOBS:
+            # Watched users are routed by user like their updates, so every shard polls only its own
+            application.job_queue.run_repeating(poll_order_status, interval=WATCH_POLL_INTERVAL)
+        # Every instance checks input against a currency table of its own
+        if shard is None:
+            application.job_queue.run_repeating(refresh_currencies, interval=CURRENCY_REFRESH_INTERVAL, first=0)
+        elif shard == sharding.LEADER:
+            application.job_queue.run_repeating(
+                sharding.refresh_currencies, interval=CURRENCY_REFRESH_INTERVAL, first=0
+            )
+    else:
+        print("Order notifications are disabled: install python-telegram-bot[job-queue] to enable them.")
+
+    metrics.instrument_application(application)
+    register_gauges()
+    return application
+
+
+def main():
+    """Main entry point for the bot."""
+    if SHARDS > 1:
+        sharding.run(SHARDS, build_application)
+        return
+
+    application = build_application()
 
-    application.run_polling()
+    if WEBHOOK_URL:
+        # Every instance behind the load balancer registers the same public URL, so this is idempotent
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+        )
+    else:
+        application.run_polling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+import asyncio
+import functools
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+from callbacks import CallbackRouter
+from utils import METRICS_WINDOW
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Latency histogram keeping a total count and sum plus a sliding window of recent samples for quantiles."""
+
+    __slots__ = ("count", "sum", "_samples")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.sum = 0.0
+        self._samples = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self._samples.append(value)
+
+    def quantiles(self) -> dict:
+        samples = sorted(self._samples)
+        if not samples:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in QUANTILES}
+
+
+# (metric name, sorted label items) -> Histogram / counter value
+histograms = {}
+counters = {}
+# metric name -> callable returning the current value, read when metrics are rendered
+gauges = {}
+
+
+def observe(name: str, value: float, **labels) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = Histogram(METRICS_WINDOW)
+    histogram.observe(value)
+
+
+def increment(name: str, amount: int = 1, **labels) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    counters[key] = counters.get(key, 0) + amount
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Record the duration of the enclosed block in seconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def instrument(callback):
+    """Wrap a handler callback so its execution time is recorded under its function name."""
+    if getattr(callback, "__instrumented__", False):
+        return callback
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        with timer("handler_seconds", handler=callback.__name__):
+            return await callback(update, context)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def instrument_application(application) -> None:
+    """Instrument every handler registered on the application, including conversation steps."""
+    def instrument_handlers(handlers):
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                instrument_handlers(handler.entry_points)
+                for state_handlers in handler.states.values():
+                    instrument_handlers(state_handlers)
+                instrument_handlers(handler.fallbacks)
+            elif isinstance(handler, CallbackRouter):
+                handler.routes = {code: instrument(callback) for code, callback in handler.routes.items()}
+            else:
+                handler.callback = instrument(handler.callback)
+
+    for group_handlers in application.handlers.values():
+        instrument_handlers(group_handlers)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records the latency of every Bot API call per method."""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        endpoint = url.rsplit("/", 1)[-1]
+        with timer("telegram_request_seconds", endpoint=endpoint):
+            return await super().do_request(url, method, *args, **kwargs)
+
+
+def _format_labels(labels: tuple, **extra) -> str:
+    items = [f'{key}="{value}"' for key, value in labels + tuple(extra.items())]
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    for (name, labels), histogram in sorted(histograms.items()):
+        for q, value in histogram.quantiles().items():
+            lines.append(f"{name}{_format_labels(labels, quantile=q)} {value:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+    for (name, labels), value in sorted(counters.items()):
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name, read in sorted(gauges.items()):
+        lines.append(f"{name} {read()}")
+    return "\n".join(lines) + "\n"
+
+
+async def _serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        # Every request gets the metrics page; read and discard the request head
+        while (await reader.readline()).strip():
+            pass
+        body = render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def _log_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        for (name, labels), histogram in sorted(histograms.items()):
+            quantiles = histogram.quantiles()
+            logger.info(
+                "%s%s count=%d p50=%.4f p95=%.4f p99=%.4f",
+                name, _format_labels(labels), histogram.count, quantiles[0.5], quantiles[0.95], quantiles[0.99],
+            )
+
+
+_server = None
+_log_task = None
+
+
+async def start(host: str, port: int, log_interval: float) -> None:
+    """Expose the metrics over HTTP on host:port (if port is set) and log them every log_interval seconds (if set)."""
+    global _server, _log_task
+    if port:
+        _server = await asyncio.start_server(_serve_metrics, host, port)
+    if log_interval > 0:
+        _log_task = asyncio.create_task(_log_periodically(log_interval))
+
+
+async def stop() -> None:
+    global _server, _log_task
+    if _log_task is not None:
+        _log_task.cancel()
+        _log_task = None
+    if _server is not None:
+        _server.close()
+        await _server.wait_closed()
+        _server = None
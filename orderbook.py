@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import backend
+from cache import TTLCache
+from utils import ORDER_BOOK_MAX_AGE, ORDER_BOOK_CACHE_SIZE
+
+
+def order_rate(order: dict) -> float:
+    """Price of one unit of the bought currency, in the sold currency."""
+    return order["amount_to_receive"] / order["amount_sold"] if order["amount_sold"] else float("inf")
+
+
+def has_owners(orders: list) -> bool:
+    """Whether every order says which user placed it; the backend is not known to always include user_id."""
+    return all("user_id" in order for order in orders)
+
+
+class OrderBookCache:
+    """Shared per-pair snapshots of /orders/list.
+
+    A pair is fetched from the backend at most once per ``max_age`` seconds no matter how many
+    users browse it; concurrent viewers of an expired pair wait for the same refresh. Snapshots
+    hold every open order of the pair, and the viewer's own orders are filtered out locally.
+    That needs the backend to say who placed each order and to list a pair without a user_id.
+    The first shared fetch finds out; if either is missing, viewers' lists are fetched with their
+    user_id from then on, so the backend excludes their orders, and cached per viewer instead.
+    """
+
+    def __init__(self, max_age: float, maxsize: int):
+        self.max_age = max_age
+        self.fetches = 0
+        # (buy_currency, sell_currency) or (buy_currency, sell_currency, viewer's user_id) -> (fetched_at, orders)
+        self._books = TTLCache(maxsize=maxsize, ttl=max_age)
+        self._refreshing = {}
+        # Whether the shared snapshots can serve viewers; None until the first shared fetch tells
+        self.shared = None
+
+    async def get(self, buy_currency: str, sell_currency: str):
+        """Return the orders selling buy_currency for sell_currency, or None if the backend failed."""
+        return await self._get((buy_currency, sell_currency))
+
+    async def get_for_user(self, buy_currency: str, sell_currency: str, user_id: int):
+        """Return the pair's orders excluding those placed by user_id, or None if the backend failed."""
+        if self.shared is not False:
+            orders = await self.get(buy_currency, sell_currency)
+            if orders and has_owners(orders):
+                self.shared = True
+            elif orders:
+                self.shared = False
+            if self.shared is not False:
+                return orders if orders is None else [order for order in orders if order["user_id"] != user_id]
+        return await self._get((buy_currency, sell_currency, user_id))
+
+    async def _get(self, key):
+        """Return the cached orders for a (buy_currency, sell_currency[, viewer]) key, refreshing them if needed."""
+        snapshot = self._books.get(key)
+        if snapshot is not None:
+            return snapshot[1]
+
+        task = self._refreshing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._refresh(key))
+            self._refreshing[key] = task
+            task.add_done_callback(lambda done: self._forget_refresh(key, done))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key):
+        buy_currency, sell_currency, *viewer = key
+        params = {"currency_to_buy": buy_currency, "currency_to_sell": sell_currency}
+        if viewer:
+            params["user_id"] = viewer[0]
+        self.fetches += 1
+        response = await backend.get("/orders/list", params=params)
+        if not viewer and 400 <= response.status_code < 500:
+            # The backend wants to know who is asking
+            self.shared = False
+        if response.status_code != 200:
+            return None
+
+        orders = response.json()
+        # A refresh that was invalidated while in flight may have read pre-mutation data; don't keep it
+        if self._refreshing.get(key) is asyncio.current_task():
+            self._books.set(key, (time.monotonic(), orders))
+        return orders
+
+    def _forget_refresh(self, key, task) -> None:
+        if self._refreshing.get(key) is task:
+            del self._refreshing[key]
+
+    def age(self, buy_currency: str, sell_currency: str):
+        """Seconds since the pair was fetched, or None if it is not cached."""
+        snapshot = self._books.get((buy_currency, sell_currency))
+        if snapshot is None:
+            return None
+        return time.monotonic() - snapshot[0]
+
+    def find(self, order_id: int):
+        """Return the cached order with the given id, or None if no cached pair contains it."""
+        for _, (_, orders) in self._books.items():
+            for order in orders:
+                if order["order_id"] == order_id:
+                    return order
+        return None
+
+    def invalidate(self, buy_currency: str, sell_currency: str) -> None:
+        """Drop the pair's shared snapshot and every per-viewer list of it."""
+        pair = (buy_currency, sell_currency)
+        for key, _ in self._books.items():
+            if key[:2] == pair:
+                self._books.invalidate(key)
+        for key in [key for key in self._refreshing if key[:2] == pair]:
+            del self._refreshing[key]
+
+    def invalidate_order(self, order_id: int) -> None:
+        """Drop every cached pair that contains the given order."""
+        for key, (_, orders) in self._books.items():
+            if any(order["order_id"] == order_id for order in orders):
+                self.invalidate(*key[:2])
+
+    def stats(self) -> dict:
+        return {**self._books.stats(), "fetches": self.fetches}
+
+
+order_books = OrderBookCache(max_age=ORDER_BOOK_MAX_AGE, maxsize=ORDER_BOOK_CACHE_SIZE)
@@ -0,0 +1,293 @@
+import asyncio
+import json
+import pickle
+import sqlite3
+import threading
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+# bot_data entries kept as one row per item, so processes sharing the database merge their changes
+_REGISTRIES = ("subscriptions", "watched_users")
+# Marks a registry row to delete among pending row changes
+_DELETED = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_data (user_id INTEGER PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS bot_data (id INTEGER PRIMARY KEY CHECK (id = 0), data BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS bot_data_rows (registry TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL,
+                                          PRIMARY KEY (registry, key));
+CREATE TABLE IF NOT EXISTS bot_data_version (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS conversations (name TEXT NOT NULL, key TEXT NOT NULL, state BLOB NOT NULL,
+                                          PRIMARY KEY (name, key));
+"""
+
+
+class SQLitePersistence(BasePersistence):
+    """Persist user_data, bot_data and conversation states in an SQLite database in WAL mode.
+
+    Writes coming from one persistence run of the application are buffered and committed
+    together in a single transaction on a worker thread, ``write_delay`` seconds after the
+    first of them. user_data is loaded lazily: nothing is read at startup and each user's row
+    is fetched the first time one of their updates is processed, or again whenever another
+    process sharing the database has written a newer version of it. Reads use a connection of
+    their own: in WAL mode they never wait for a writer, so they can run on the event loop.
+
+    The registries in bot_data, subscriptions and watched_users, are stored as one row per
+    subscription or watched user. Only the rows this process changed are written, and bot_data
+    is reloaded and merged with local changes whenever another process has written rows, so
+    processes sharing the database don't overwrite each other. The rest of bot_data is a single
+    pickled row that the last writer wins.
+    """
+
+    def __init__(self, path: str, update_interval: float = 60, write_delay: float = 0.5):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=True, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self.write_delay = write_delay
+
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA busy_timeout=5000")
+        self._connection.executescript(_SCHEMA)
+        # Held by the writer thread for a whole transaction; reads don't take it
+        self._db_lock = threading.Lock()
+
+        self._reader = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._reader.execute("PRAGMA query_only=1")
+
+        # user_id -> version of the row this process last read or wrote
+        self._versions = {}
+        self._pending_users = {}
+        self._pending_conversations = {}
+        self._pending_bot_data = None
+        self._write_task = None
+        # Registry rows as they will be in the database once the changes queued below are written
+        self._synced_rows = {}
+        self._rows_version = 0
+        # (registry, key) -> value or _DELETED: changes not yet written, and those being written
+        self._pending_rows = {}
+        self._writing_rows = {}
+
+    # Reading
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        row = self._reader.execute("SELECT data FROM bot_data WHERE id = 0").fetchone()
+        data = pickle.loads(row[0]) if row else {}
+        # Registries pickled whole by an earlier version count as local changes, so they get written as rows
+        legacy = _to_rows(data)
+        self._rows_version, self._synced_rows = self._read_rows()
+        _from_rows(data, {**self._synced_rows, **legacy})
+        return data
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        rows = self._reader.execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        if user_id in self._pending_users:
+            return
+
+        try:
+            row = self._reader.execute(
+                "SELECT version, data FROM user_data WHERE user_id = ? AND version > ?",
+                (user_id, self._versions.get(user_id, 0)),
+            ).fetchone()
+        except sqlite3.OperationalError as e:
+            # e.g. the database is locked while another process recovers the WAL; keep what is in memory
+            print(f"Failed to refresh user_data of {user_id}: {e}")
+            return
+        if row is None:
+            return
+
+        self._versions[user_id] = row[0]
+        user_data.clear()
+        user_data.update(pickle.loads(row[1]))
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        try:
+            row = self._reader.execute("SELECT version FROM bot_data_version WHERE id = 0").fetchone()
+            if row is None or row[0] <= self._rows_version:
+                return
+            version, rows = self._read_rows()
+        except sqlite3.OperationalError as e:
+            print(f"Failed to refresh bot_data: {e}")
+            return
+
+        # The database plus this process's changes: those queued or being written, and those since the last update
+        _apply(rows, {**self._writing_rows, **self._pending_rows})
+        local = _changes(self._synced_rows, _to_rows(bot_data))
+        self._rows_version, self._synced_rows = version, dict(rows)
+        _apply(rows, local)
+        _from_rows(bot_data, rows)
+
+    # Writing
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._pending_users[user_id] = data
+        self._schedule_write()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._pending_users[user_id] = None
+        self._schedule_write()
+
+    async def update_bot_data(self, data: dict) -> None:
+        rows = _to_rows(data)
+        self._pending_rows.update(_changes(self._synced_rows, rows))
+        self._synced_rows = rows
+        self._pending_bot_data = {key: value for key, value in data.items() if key not in _REGISTRIES}
+        self._schedule_write()
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        self._pending_conversations[(name, json.dumps(key))] = new_state
+        self._schedule_write()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._write_task is not None:
+            self._write_task.cancel()
+            self._write_task = None
+        await self._write_pending()
+        self._reader.close()
+        with self._db_lock:
+            self._connection.close()
+
+    def _schedule_write(self) -> None:
+        if self._write_task is None:
+            self._write_task = asyncio.create_task(self._delayed_write())
+
+    async def _delayed_write(self) -> None:
+        await asyncio.sleep(self.write_delay)
+        self._write_task = None
+        await self._write_pending()
+
+    async def _write_pending(self) -> None:
+        batch = (self._pending_users, self._pending_conversations, self._pending_bot_data, self._pending_rows)
+        self._pending_users, self._pending_conversations, self._pending_bot_data = {}, {}, None
+        self._writing_rows, self._pending_rows = self._pending_rows, {}
+        try:
+            await asyncio.to_thread(self._write, *batch)
+        finally:
+            self._writing_rows = {}
+
+    def _read_rows(self) -> tuple:
+        """Return the registry rows' version and the rows, as (registry, key) -> value."""
+        row = self._reader.execute("SELECT version FROM bot_data_version WHERE id = 0").fetchone()
+        rows = self._reader.execute("SELECT registry, key, value FROM bot_data_rows").fetchall()
+        return row[0] if row else 0, {(registry, key): pickle.loads(value) for registry, key, value in rows}
+
+    def _write(self, users: dict, conversations: dict, bot_data, bot_data_rows: dict = None) -> None:
+        if not users and not conversations and bot_data is None and not bot_data_rows:
+            return
+
+        with self._db_lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                for user_id, data in users.items():
+                    if data is None:
+                        self._connection.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+                        self._versions.pop(user_id, None)
+                        continue
+                    version = self._connection.execute(
+                        "INSERT INTO user_data (user_id, version, data) VALUES (?, 1, ?) "
+                        "ON CONFLICT (user_id) DO UPDATE SET version = version + 1, data = excluded.data "
+                        "RETURNING version",
+                        (user_id, pickle.dumps(data)),
+                    ).fetchone()[0]
+                    self._versions[user_id] = version
+
+                for (name, key), state in conversations.items():
+                    if state is None:
+                        self._connection.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (name, key))
+                    else:
+                        self._connection.execute(
+                            "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                            (name, key, pickle.dumps(state)),
+                        )
+
+                if bot_data is not None:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO bot_data (id, data) VALUES (0, ?)", (pickle.dumps(bot_data),)
+                    )
+
+                if bot_data_rows:
+                    for (registry, key), value in bot_data_rows.items():
+                        if value is _DELETED:
+                            self._connection.execute(
+                                "DELETE FROM bot_data_rows WHERE registry = ? AND key = ?", (registry, key)
+                            )
+                        else:
+                            self._connection.execute(
+                                "INSERT OR REPLACE INTO bot_data_rows (registry, key, value) VALUES (?, ?, ?)",
+                                (registry, key, pickle.dumps(value)),
+                            )
+                    self._connection.execute(
+                        "INSERT INTO bot_data_version (id, version) VALUES (0, 1) "
+                        "ON CONFLICT (id) DO UPDATE SET version = version + 1"
+                    )
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+
+def _to_rows(bot_data: dict) -> dict:
+    """The registries in bot_data as (registry, key) -> value rows."""
+    rows = {}
+    for (buy_currency, sell_currency), subscribers in bot_data.get("subscriptions", {}).items():
+        for user_id, max_rate in subscribers.items():
+            rows[("subscriptions", json.dumps([buy_currency, sell_currency, user_id]))] = max_rate
+    for user_id in bot_data.get("watched_users", ()):
+        rows[("watched_users", json.dumps(user_id))] = None
+    return rows
+
+
+def _from_rows(bot_data: dict, rows: dict) -> None:
+    """Rebuild the registries in bot_data, in place, from (registry, key) -> value rows."""
+    subscriptions = bot_data.setdefault("subscriptions", {})
+    watched_users = bot_data.setdefault("watched_users", set())
+    subscriptions.clear()
+    watched_users.clear()
+    for (registry, key), value in rows.items():
+        if registry == "subscriptions":
+            buy_currency, sell_currency, user_id = json.loads(key)
+            subscriptions.setdefault((buy_currency, sell_currency), {})[user_id] = value
+        elif registry == "watched_users":
+            watched_users.add(json.loads(key))
+
+
+def _changes(old: dict, new: dict) -> dict:
+    """The row changes turning old into new, with _DELETED for removed rows."""
+    changes = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    changes.update((key, _DELETED) for key in old.keys() - new.keys())
+    return changes
+
+
+def _apply(rows: dict, changes: dict) -> None:
+    for key, value in changes.items():
+        if value is _DELETED:
+            rows.pop(key, None)
+        else:
+            rows[key] = value
@@ -0,0 +1,204 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+import metrics
+
+# Priorities passed as rate_limit_args={"priority": ...}; lower values are sent first
+INTERACTIVE, BULK = 0, 1
+
+# Telegram rejects messages longer than this, so merged texts must stay below it
+MAX_MESSAGE_LENGTH = 4096
+
+
+class _TokenBucket:
+    """Token bucket whose waiters are served by priority, then in arrival order."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._releaser = None
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self) -> bool:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def time_until_full(self) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        return max(0.0, self._paused_until - now) + (self.capacity - self._tokens) / self.rate
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        if not self._waiters and self._take():
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._releaser is None or self._releaser.done():
+            self._releaser = asyncio.create_task(self._release())
+        await future
+
+    async def _release(self) -> None:
+        while self._waiters:
+            if self._waiters[0][2].cancelled():
+                heapq.heappop(self._waiters)
+            elif self._take():
+                heapq.heappop(self._waiters)[2].set_result(None)
+            else:
+                now = time.monotonic()
+                await asyncio.sleep(max(self._paused_until - now, (1 - self._tokens) / self.rate))
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the given number of seconds, e.g. after Telegram's flood control kicked in."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class _Request:
+    __slots__ = ("callback", "args", "kwargs", "endpoint", "data", "futures")
+
+    def __init__(self, callback, args, kwargs, endpoint, data, future):
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.endpoint = endpoint
+        self.data = data
+        self.futures = [future]
+
+    def merge(self, other: "_Request") -> bool:
+        """Append other's text to this sendMessage if both are plain sends with identical options."""
+        if self.endpoint != "sendMessage" or other.endpoint != "sendMessage":
+            return False
+        if any(key in data for data in (self.data, other.data) for key in ("reply_markup", "entities")):
+            return False
+        if {k: v for k, v in self.data.items() if k != "text"} != {k: v for k, v in other.data.items() if k != "text"}:
+            return False
+
+        text = f"{self.data['text']}\n\n{other.data['text']}"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            return False
+        # data is the same dict object the Bot will serialize, so the merged text is what gets sent
+        self.data["text"] = text
+        self.futures.extend(other.futures)
+        return True
+
+
+class _ChatQueue:
+    def __init__(self, bucket: _TokenBucket):
+        self.bucket = bucket
+        self.pending = []
+        self.worker = None
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """Rate limiter for all Bot API calls made by the application.
+
+    Calls are queued per chat and sent one at a time per chat, honouring a per-chat token bucket
+    (stricter for groups) and a global token bucket. Interactive requests overtake bulk ones both
+    within a chat and for the global budget. Consecutive plain-text sendMessage calls waiting for
+    the same chat are merged into one message. A RetryAfter from Telegram pauses the affected
+    chat (or the global budget for calls not bound to a chat) for the requested time before the
+    call is retried.
+    """
+
+    def __init__(self, overall_rate: float, chat_rate: float, chat_burst: float, group_rate: float,
+                 max_retries: int):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        # No burst allowance: a full second's worth at once plus the refill would exceed the rate in that second
+        self._global = _TokenBucket(overall_rate, 1)
+        self._chats = {}
+        self._seq = itertools.count()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        for queue in self._chats.values():
+            if queue.worker is not None:
+                queue.worker.cancel()
+            for _, _, request in queue.pending:
+                for future in request.futures:
+                    future.cancel()
+        self._chats.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = (rate_limit_args or {}).get("priority", INTERACTIVE)
+        chat_id = data.get("chat_id")
+        if chat_id is None:
+            return await self._send(callback, args, kwargs, priority, self._global)
+
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            # Negative ids and @usernames belong to groups and channels, which have a lower limit
+            is_group = isinstance(chat_id, str) or int(chat_id) < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            queue = self._chats[chat_id] = _ChatQueue(_TokenBucket(rate, 1 if is_group else self.chat_burst))
+
+        future = asyncio.get_running_loop().create_future()
+        request = _Request(callback, args, kwargs, endpoint, data, future)
+        heapq.heappush(queue.pending, (priority, next(self._seq), request))
+        if queue.worker is None:
+            queue.worker = asyncio.create_task(self._drain(chat_id, queue))
+        return await future
+
+    async def _drain(self, chat_id, queue: _ChatQueue) -> None:
+        while True:
+            if not queue.pending:
+                # Linger until the chat's bucket has refilled so a fresh queue can't exceed the chat's rate
+                await asyncio.sleep(queue.bucket.time_until_full())
+                if not queue.pending:
+                    del self._chats[chat_id]
+                    return
+
+            priority, _, request = heapq.heappop(queue.pending)
+            while queue.pending and queue.pending[0][0] == priority and request.merge(queue.pending[0][2]):
+                heapq.heappop(queue.pending)
+                metrics.increment("telegram_merged_messages_total")
+
+            try:
+                await queue.bucket.acquire(priority)
+                result = await self._send(request.callback, request.args, request.kwargs, priority, queue.bucket)
+            except Exception as exc:
+                for future in request.futures:
+                    if not future.done():
+                        future.set_exception(exc)
+            else:
+                for future in request.futures:
+                    if not future.done():
+                        future.set_result(result)
+
+    async def _send(self, callback, args, kwargs, priority: int, bucket: _TokenBucket):
+        for attempt in range(self.max_retries + 1):
+            await self._global.acquire(priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = exc.retry_after
+                retry_after = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else retry_after
+                metrics.increment("telegram_flood_waits_total")
+                bucket.pause(retry_after + 0.1)
+                await asyncio.sleep(retry_after + 0.1)
@@ -0,0 +1,156 @@
+import asyncio
+import multiprocessing
+import signal
+
+from telegram import Bot, Update
+from telegram.ext import ContextTypes, Updater
+
+import callbacks
+from validation import currencies
+from utils import TELEGRAM_TOKEN, TELEGRAM_API_URL, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, \
+    WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS
+
+
+# The shard running the jobs the whole bot needs only once: subscription polling and the currency refresh
+LEADER = 0
+
+# In a worker, the other shards' queues, for sharing state that isn't an update
+_peers = []
+
+
+def _is_subscription(update: Update) -> bool:
+    if update.callback_query is not None:
+        code, _ = callbacks.parse(update.callback_query.data or "")
+        return code in (callbacks.SUBSCRIBE_PAIR, callbacks.UNSUBSCRIBE_PAIR)
+    text = update.message.text if update.message is not None else None
+    return bool(text) and text.split(maxsplit=1)[0].split("@")[0] in ("/subscribe", "/unsubscribe")
+
+
+def shard_of(update: Update, shards: int) -> int:
+    """Pick the shard for an update: by user, so each user's conversation and caches live in one worker.
+
+    Subscription changes go to the leader instead, which keeps the only subscription registry, so
+    each subscribed pair is polled once however many shards its subscribers' updates go to.
+    """
+    if _is_subscription(update):
+        return LEADER
+    if update.effective_user is not None:
+        return update.effective_user.id % shards
+    if update.effective_chat is not None:
+        return update.effective_chat.id % shards
+    return 0
+
+
+def run(shards: int, build_application) -> None:
+    """Run the bot as one update router plus a worker process per shard.
+
+    The router only receives updates (by polling or webhook, like the single-process mode) and
+    forwards each to its shard's worker. Every worker runs its own Application built with
+    build_application(shard), so caches, jobs and conversation state are per shard; the jobs
+    shared by all users only run in the LEADER shard.
+    """
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue() for _ in range(shards)]
+    workers = [
+        context.Process(target=_worker_main, args=(shard, queues, build_application), name=f"shard-{shard}")
+        for shard in range(shards)
+    ]
+    for worker in workers:
+        worker.start()
+
+    try:
+        asyncio.run(_route(queues))
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for worker in workers:
+            worker.join()
+
+
+async def _route(queues: list) -> None:
+    bot = Bot(TELEGRAM_TOKEN, base_url=f"{TELEGRAM_API_URL}/bot") if TELEGRAM_API_URL else Bot(TELEGRAM_TOKEN)
+    update_queue = asyncio.Queue()
+    updater = Updater(bot, update_queue)
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    async with updater:
+        if WEBHOOK_URL:
+            await updater.start_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+            )
+        else:
+            await updater.start_polling()
+
+        forwarding = asyncio.create_task(_forward(update_queue, queues))
+        await stopping.wait()
+        await updater.stop()
+
+    # Hand over what the updater fetched before stopping; Telegram won't resend those updates
+    forwarding.cancel()
+    while not update_queue.empty():
+        _dispatch(update_queue.get_nowait(), queues)
+
+
+async def _forward(update_queue: asyncio.Queue, queues: list) -> None:
+    while True:
+        _dispatch(await update_queue.get(), queues)
+
+
+def _dispatch(update: Update, queues: list) -> None:
+    queues[shard_of(update, len(queues))].put(update.to_dict())
+
+
+def broadcast(message: dict) -> None:
+    """Send a message to the other shards' workers; does nothing outside a sharded worker."""
+    for queue in _peers:
+        queue.put(message)
+
+
+async def refresh_currencies(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """The leader's currency refresh: reload the table and hand it to the other shards."""
+    await currencies.refresh()
+    broadcast({"currencies": currencies.fetched()})
+
+
+def _worker_main(shard: int, queues: list, build_application) -> None:
+    # Ctrl+C reaches the whole process group; workers stop when the router tells them to
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_work(shard, queues, build_application))
+
+
+async def _work(shard: int, queues: list, build_application) -> None:
+    """Feed the updates routed to this shard into its Application, following run_polling's lifecycle."""
+    queue = queues[shard]
+    _peers[:] = [peer for number, peer in enumerate(queues) if number != shard]
+    application = build_application(shard)
+    loop = asyncio.get_running_loop()
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, queue.get)
+            if data is None:
+                break
+            if "currencies" in data:
+                currencies.set_fetched(data["currencies"])
+            else:
+                await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,193 @@
+import asyncio
+
+from telegram import Update, InlineKeyboardMarkup
+from telegram.error import Forbidden
+from telegram.ext import ContextTypes
+
+import callbacks
+import metrics
+from keyboards import button
+from handlers import format_order
+from orderbook import has_owners, order_books, order_rate
+from scheduler import BULK
+from validation import ValidationError, currencies, parse_amount, check_pair
+from watcher import order_watcher
+from utils import MAX_SUBSCRIPTIONS_PER_USER, SUBSCRIPTION_FANOUT_BATCH, ORDERS_PAGE_SIZE
+
+# (buy_currency, sell_currency) -> {order_id: (amount_sold, amount_to_receive, status)} as of the last poll
+_last_seen = {}
+
+
+def get_subscriptions(context: ContextTypes.DEFAULT_TYPE) -> dict:
+    """Return the (buy_currency, sell_currency) -> {user_id: max_rate or None} registry kept in bot_data."""
+    return context.bot_data.setdefault("subscriptions", {})
+
+
+def diff_book(pair, orders: list) -> list:
+    """Return orders of the pair that are new or changed since the previous poll.
+
+    The first poll of a pair only records a baseline, so subscribers aren't flooded with the whole book.
+    """
+    current = {order["order_id"]: (order["amount_sold"], order["amount_to_receive"], order["status"]) for order in orders}
+    previous = _last_seen.get(pair)
+    _last_seen[pair] = current
+    if previous is None:
+        return []
+    return [order for order in orders if previous.get(order["order_id"]) != current[order["order_id"]]]
+
+
+def render_notification(pair, orders: list):
+    buy_currency, sell_currency = pair
+    shown = orders[:ORDERS_PAGE_SIZE]
+    message_text = f"🔔 New or updated orders to buy {buy_currency} with {sell_currency}:\n\n"
+    message_text += "\n\n".join(format_order(order) for order in shown)
+    if len(orders) > len(shown):
+        message_text += f"\n\n…and {len(orders) - len(shown)} more."
+
+    # The pair goes along, as the user may not be in the Buy Crypto flow that would otherwise provide it
+    keyboard = [
+        [button(f"Buy #{order['order_id']}", callbacks.BUY_ORDER, order["order_id"], buy_currency, sell_currency)]
+        for order in shown
+    ]
+    keyboard.append([button("Unsubscribe", callbacks.UNSUBSCRIBE_PAIR, buy_currency, sell_currency)])
+    return message_text, InlineKeyboardMarkup(keyboard)
+
+
+def exclude_own(orders: list, user_id: int) -> list:
+    """Drop the orders user_id placed, as far as the bot knows without asking the backend.
+
+    When the backend doesn't say who placed the orders this goes by the order watcher's index,
+    which holds the orders created through the bot as of the owner's last watch poll.
+    """
+    if has_owners(orders):
+        return [order for order in orders if order["user_id"] != user_id]
+    own = order_watcher.order_ids(user_id)
+    return [order for order in orders if order["order_id"] not in own]
+
+
+async def _notify(context: ContextTypes.DEFAULT_TYPE, pair, user_id: int, orders: list) -> None:
+    # Subscribers aren't told about their own orders; one slipping through is rejected if they try to buy it
+    orders = exclude_own(orders, user_id)
+    if not orders:
+        return
+
+    message_text, reply_markup = render_notification(pair, orders)
+    try:
+        await context.bot.send_message(
+            chat_id=user_id, text=message_text, reply_markup=reply_markup, rate_limit_args={"priority": BULK}
+        )
+        metrics.increment("subscription_notifications_total")
+    except Forbidden:
+        # The user blocked the bot; stop notifying them
+        get_subscriptions(context).get(pair, {}).pop(user_id, None)
+    except Exception as e:
+        print(f"Failed to notify {user_id} about {pair}: {e}")
+
+
+async def poll_subscriptions(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Job: fetch each subscribed pair once, diff it and push new or changed orders to its subscribers."""
+    subscriptions = get_subscriptions(context)
+    for pair in [pair for pair, subscribers in subscriptions.items() if not subscribers]:
+        del subscriptions[pair]
+        _last_seen.pop(pair, None)
+
+    pairs = list(subscriptions)
+    books = await asyncio.gather(*(order_books.get(*pair) for pair in pairs))
+
+    notifications = []
+    for pair, orders in zip(pairs, books):
+        if orders is None:
+            continue
+        changed = diff_book(pair, orders)
+        if not changed:
+            continue
+
+        # Another process may have dropped the pair's last subscriber while the books were fetched
+        for user_id, max_rate in list(subscriptions.get(pair, {}).items()):
+            matching = [order for order in changed if max_rate is None or order_rate(order) <= max_rate]
+            if matching:
+                notifications.append((pair, user_id, matching))
+
+    # Fan out in batches so thousands of subscribers don't turn into thousands of concurrent tasks
+    for start in range(0, len(notifications), SUBSCRIPTION_FANOUT_BATCH):
+        batch = notifications[start:start + SUBSCRIPTION_FANOUT_BATCH]
+        await asyncio.gather(*(_notify(context, pair, user_id, orders) for pair, user_id, orders in batch))
+
+
+def subscribe_user(context: ContextTypes.DEFAULT_TYPE, user_id: int, pair, max_rate: float = None) -> bool:
+    """Subscribe the user to the pair; returns False if they already have too many subscriptions."""
+    subscriptions = get_subscriptions(context)
+    subscribed = sum(user_id in subscribers for subscribers in subscriptions.values())
+    if user_id not in subscriptions.get(pair, {}) and subscribed >= MAX_SUBSCRIPTIONS_PER_USER:
+        return False
+    subscriptions.setdefault(pair, {})[user_id] = max_rate
+    return True
+
+
+async def subscribe_pair(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the 'Notify Me' button: subscribe to the currency pair the user is browsing."""
+    query = update.callback_query
+
+    if len(context.args) == 2:
+        pair = tuple(context.args)
+    elif "buy_currency" in context.user_data and "sell_currency" in context.user_data:
+        # Buttons sent before they carried their pair
+        pair = (context.user_data["buy_currency"], context.user_data["sell_currency"])
+    else:
+        await query.answer("Please open Buy Crypto again to choose a currency pair.")
+        return
+
+    if subscribe_user(context, update.effective_user.id, pair):
+        await query.answer(f"You'll be notified about new orders to buy {pair[0]} with {pair[1]}.")
+    else:
+        await query.answer(f"You can't have more than {MAX_SUBSCRIPTIONS_PER_USER} subscriptions.")
+
+
+async def unsubscribe_pair(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the 'Unsubscribe' button under a notification."""
+    query = update.callback_query
+    user_id = update.effective_user.id
+
+    pair = tuple(context.args)
+
+    get_subscriptions(context).get(pair, {}).pop(user_id, None)
+    await query.answer("Unsubscribed.")
+    await query.edit_message_reply_markup(reply_markup=None)
+
+
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/subscribe <buy_currency> <sell_currency> [max_rate]: get notified about new orders for a pair."""
+    args = context.args
+    if len(args) not in (2, 3):
+        await update.message.reply_text("Usage: /subscribe <buy_currency> <sell_currency> [max_rate]")
+        return
+
+    try:
+        pair = (currencies.parse(args[0]), currencies.parse(args[1]))
+        check_pair(*pair)
+        max_rate = parse_amount(args[2]) if len(args) == 3 else None
+    except ValidationError as e:
+        await update.message.reply_text(str(e))
+        return
+    if not subscribe_user(context, update.effective_user.id, pair, max_rate):
+        await update.message.reply_text(f"You can't have more than {MAX_SUBSCRIPTIONS_PER_USER} subscriptions.")
+        return
+
+    message_text = f"🔔 You'll be notified about new orders to buy {pair[0]} with {pair[1]}"
+    if max_rate is not None:
+        message_text += f" at a rate of at most {max_rate} {pair[1]} per {pair[0]}"
+    await update.message.reply_text(message_text + ".")
+
+
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/unsubscribe [<buy_currency> <sell_currency>]: stop notifications for one pair, or for all of them."""
+    user_id = update.effective_user.id
+    subscriptions = get_subscriptions(context)
+
+    if len(context.args) == 2:
+        subscriptions.get(tuple(code.upper() for code in context.args), {}).pop(user_id, None)
+    else:
+        for subscribers in subscriptions.values():
+            subscribers.pop(user_id, None)
+
+    await update.message.reply_text("You have been unsubscribed.")
@@ -0,0 +1,55 @@
+import contextlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import backend
+from bench.fake_backend import FakeBackend
+from cache import TTLCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_backend(monkeypatch):
+    """Give every test its own backend client, breakers and response caches.
+
+    Tests run their own event loops, so nothing bound to a previous loop may be reused.
+    """
+    monkeypatch.setattr(backend, "_client", None)
+    monkeypatch.setattr(backend, "_semaphore", None)
+    monkeypatch.setattr(backend, "_pending_requests", 0)
+    monkeypatch.setattr(backend, "breakers", {})
+    monkeypatch.setattr(backend, "_in_flight", {})
+    monkeypatch.setattr(backend, "single_flight_stats", {"sent": 0, "collapsed": 0})
+    monkeypatch.setattr(backend, "_last_good", TTLCache(maxsize=100, ttl=600))
+    monkeypatch.setattr(backend, "BACKEND_RETRY_BACKOFF", 0.01)
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    """Serve a FakeBackend as the bot's backend for the duration of an ``async with`` block.
+
+        async with fake_backend(latency=0.2) as fake:
+            ...
+
+    Keyword arguments go to FakeBackend; ``with_orders`` adds users 1, 2 and 3 and one open
+    BTC → USDT order each by users 1 and 2. The backend client and the fake are closed on the
+    way out, also when the test fails.
+    """
+    @contextlib.asynccontextmanager
+    async def serve(with_orders: bool = False, **options):
+        async with FakeBackend(**options) as fake:
+            if with_orders:
+                for user_id in (1, 2, 3):
+                    fake.add_user(user_id)
+                fake.add_order(1, "BTC", "USDT", 1, 30000)
+                fake.add_order(2, "BTC", "USDT", 2, 31000)
+            monkeypatch.setattr(backend, "API_URL", fake.url)
+            try:
+                yield fake
+            finally:
+                await backend.close()
+
+    return serve
@@ -0,0 +1,203 @@
+import asyncio
+import contextlib
+import time
+
+import backend
+
+
+def test_concurrent_requests_do_not_wait_for_each_other(fake_backend):
+    async def main():
+        async with fake_backend(latency=0.2) as fake:
+            for user_id in range(50):
+                fake.add_user(user_id)
+
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                *(backend.get("/user/info", params={"user_id": user_id}) for user_id in range(50))
+            )
+            elapsed = time.perf_counter() - started
+
+        return responses, elapsed
+
+    responses, elapsed = asyncio.run(main())
+    assert all(response.status_code == 200 for response in responses)
+    # 50 sequential calls would take 10 s
+    assert elapsed < 1.5
+
+
+def test_identical_concurrent_gets_share_one_request(fake_backend):
+    async def main():
+        async with fake_backend(latency=0.2) as fake:
+            for user_id in range(3):
+                fake.add_user(user_id)
+
+            responses = await asyncio.gather(
+                *(backend.get("/user/info", params={"user_id": n % 3}) for n in range(30))
+            )
+
+        return fake, responses
+
+    fake, responses = asyncio.run(main())
+    assert all(response.status_code == 200 for response in responses)
+    assert fake.requests[("GET", "/user/info")] == 3
+    assert backend.single_flight_stats == {"sent": 3, "collapsed": 27}
+
+
+def test_reads_after_a_mutation_do_not_join_an_earlier_get(fake_backend):
+    async def main():
+        async with fake_backend() as fake:
+            fake.add_user(1)
+            # The first read is slow, so it is still in flight when the order has been created
+            fake.inject("/user/orders", delay=0.3)
+
+            before = asyncio.create_task(backend.get("/user/orders", params={"user_id": 1}))
+            await asyncio.sleep(0.05)
+            created = await backend.post("/order/create", json={
+                "user_id": 1, "from_currency": "BTC", "to_currency": "USDT", "value": 1, "exchange_rate": 30000,
+            })
+            after = await backend.get("/user/orders", params={"user_id": 1})
+            await before
+
+        return fake, created, after
+
+    fake, created, after = asyncio.run(main())
+    assert created.status_code == 200
+    assert fake.requests[("GET", "/user/orders")] == 2
+    assert len(after.json()) == 1
+
+
+def test_failed_get_serves_the_last_good_response(fake_backend):
+    async def main():
+        async with fake_backend(gzip=True) as fake:
+            fake.add_user(1)
+
+            fresh = await backend.get("/user/info", params={"user_id": 1})
+            fake.inject("/user/info", status=500, times=3)
+            stale = await backend.get("/user/info", params={"user_id": 1})
+
+        return fresh, stale
+
+    fresh, stale = asyncio.run(main())
+    assert not backend.is_stale(fresh)
+    assert backend.is_stale(stale)
+    assert stale.json() == fresh.json()
+
+
+def test_hung_backend_times_out_instead_of_holding_the_handler(monkeypatch, fake_backend):
+    monkeypatch.setitem(backend.ENDPOINT_TIMEOUTS, "/order/create", 0.2)
+
+    async def main():
+        async with fake_backend() as fake:
+            fake.inject("/order/create", delay=5)
+
+            started = time.perf_counter()
+            response = await backend.post("/order/create", json={})
+            elapsed = time.perf_counter() - started
+
+        return response, elapsed
+
+    response, elapsed = asyncio.run(main())
+    assert response.status_code == 504
+    assert elapsed < 1
+
+
+def test_open_circuit_fails_fast_and_recovers(monkeypatch, fake_backend):
+    monkeypatch.setattr(backend, "BREAKER_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(backend, "BREAKER_RESET_TIMEOUT", 0.2)
+
+    async def main():
+        async with fake_backend() as fake:
+            fake.add_user(1)
+            fake.inject("/user/info", drop=True, times=3)
+
+            failed = await backend.get("/user/info", params={"user_id": 1})
+            rejected = await backend.get("/user/info", params={"user_id": 1})
+            sent_while_open = fake.requests[("GET", "/user/info")]
+            await asyncio.sleep(0.3)
+            recovered = await backend.get("/user/info", params={"user_id": 1})
+
+        return failed, rejected, sent_while_open, recovered
+
+    failed, rejected, sent_while_open, recovered = asyncio.run(main())
+    assert failed.status_code == 503
+    assert rejected.status_code == 503
+    assert sent_while_open == 3
+    assert recovered.status_code == 200
+    assert not backend.breakers["/user/info"].is_open()
+
+
+def test_cancelled_trial_call_does_not_keep_the_circuit_open(monkeypatch, fake_backend):
+    monkeypatch.setattr(backend, "BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(backend, "BREAKER_RESET_TIMEOUT", 0.1)
+
+    async def main():
+        async with fake_backend() as fake:
+            fake.add_user(1)
+            fake.inject("/user/info", status=500, times=1)
+            await backend.request("GET", "/user/info", params={"user_id": 1})
+
+            await asyncio.sleep(0.2)
+            fake.inject("/user/info", delay=5)
+            trial = asyncio.create_task(backend.request("GET", "/user/info", params={"user_id": 1}))
+            await asyncio.sleep(0.1)
+            trial.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await trial
+            recovered = await backend.request("GET", "/user/info", params={"user_id": 1})
+
+        return recovered
+
+    assert asyncio.run(main()).status_code == 200
+
+
+def test_requests_beyond_the_budget_are_shed(monkeypatch, fake_backend):
+    monkeypatch.setattr(backend, "BACKEND_MAX_IN_FLIGHT", 5)
+
+    async def main():
+        async with fake_backend(latency=0.2) as fake:
+            for user_id in range(10):
+                fake.add_user(user_id)
+
+            responses = await asyncio.gather(
+                *(backend.get("/user/info", params={"user_id": user_id}) for user_id in range(10))
+            )
+
+        return fake, responses
+
+    fake, responses = asyncio.run(main())
+    assert sorted(response.status_code for response in responses) == [200] * 5 + [503] * 5
+    assert fake.requests[("GET", "/user/info")] == 5
+
+
+def create_order_timing_out_once(monkeypatch, fake_backend, dedupe: bool):
+    """Create an order whose first attempt times out after the backend applied it."""
+    monkeypatch.setattr(backend, "BACKEND_DEDUPES_IDEMPOTENCY_KEYS", dedupe)
+    monkeypatch.setitem(backend.ENDPOINT_TIMEOUTS, "/order/create", 0.2)
+
+    async def main():
+        async with fake_backend(dedupe_idempotency_keys=dedupe) as fake:
+            fake.add_user(1)
+            fake.inject("/order/create", delay=0.5)
+
+            response = await backend.post("/order/create", idempotency_key="key-1", json={
+                "user_id": 1, "from_currency": "BTC", "to_currency": "USDT", "value": 1, "exchange_rate": 30000,
+            })
+            # Let the timed-out attempt finish on the backend's side
+            await asyncio.sleep(0.5)
+
+        return fake, response
+
+    return asyncio.run(main())
+
+
+def test_mutations_are_not_retried_by_default(monkeypatch, fake_backend):
+    fake, response = create_order_timing_out_once(monkeypatch, fake_backend, dedupe=False)
+    assert response.status_code == 504
+    assert fake.requests[("POST", "/order/create")] == 1
+
+
+def test_mutations_are_retried_when_the_backend_dedupes_them(monkeypatch, fake_backend):
+    fake, response = create_order_timing_out_once(monkeypatch, fake_backend, dedupe=True)
+    assert response.status_code == 200
+    assert fake.requests[("POST", "/order/create")] == 2
+    assert len(fake.orders) == 1
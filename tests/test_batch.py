@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import batch
+import handlers
+from orderbook import OrderBookCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_batch(monkeypatch):
+    monkeypatch.setattr(batch, "_unsupported", set())
+    monkeypatch.setattr(handlers, "order_books", OrderBookCache(max_age=60, maxsize=100))
+
+
+@pytest.mark.parametrize("batch_endpoints", [True, False])
+def test_bought_orders_always_carry_both_amounts(fake_backend, batch_endpoints):
+    async def main():
+        async with fake_backend(with_orders=True, batch_endpoints=batch_endpoints) as fake:
+            return list(fake.orders), await batch.buy_orders(3, {order_id: 1 for order_id in fake.orders})
+
+    order_ids, results = asyncio.run(main())
+    assert set(results) == set(order_ids)
+    assert all({"amount_to_receive", "amount_paid"} <= set(result) for result in results.values())
+
+
+def test_bulk_buy_reports_purchases_the_batch_endpoint_gave_no_amounts_for(fake_backend):
+    edits = []
+
+    async def answer():
+        pass
+
+    async def edit_message_text(text, **kwargs):
+        edits.append(text)
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=3),
+        callback_query=SimpleNamespace(answer=answer, edit_message_text=edit_message_text),
+    )
+
+    async def main():
+        async with fake_backend(with_orders=True, batch_endpoints=True) as fake:
+            context = SimpleNamespace(user_data={
+                "buy_currency": "BTC", "sell_currency": "USDT", "selected_buy_orders": list(fake.orders),
+            })
+            await handlers.bulk_buy_orders(update, context)
+            return list(fake.orders)
+
+    order_ids = asyncio.run(main())
+    assert edits == ["\n".join(f"✅ #{order_id}: bought" for order_id in order_ids)]
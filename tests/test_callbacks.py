@@ -0,0 +1,24 @@
+import asyncio
+from types import SimpleNamespace
+
+import callbacks
+from bench.updates import callback_update
+from callbacks import CallbackRouter
+
+
+def test_router_dispatches_on_the_code_parsed_by_check_update(monkeypatch):
+    calls = []
+
+    async def delete_order(update, context):
+        calls.append((context.action_code, context.args))
+
+    router = CallbackRouter({callbacks.DELETE_ORDER: delete_order})
+    update = callback_update(1, 1, callbacks.encode(callbacks.DELETE_ORDER, 42))
+    check_result = router.check_update(update)
+
+    parsed = []
+    monkeypatch.setattr(callbacks, "parse", lambda data: parsed.append(data))
+    asyncio.run(router.handle_update(update, None, check_result, SimpleNamespace()))
+
+    assert calls == [(callbacks.DELETE_ORDER, [42])]
+    assert parsed == []
@@ -0,0 +1,136 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from telegram.ext import ConversationHandler
+
+import batch
+import callbacks
+import handlers
+from orderbook import OrderBookCache
+from subscriptions import render_notification
+from userinfo import UserInfoCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    monkeypatch.setattr(handlers, "order_books", OrderBookCache(max_age=60, maxsize=100))
+    monkeypatch.setattr(handlers, "user_infos", UserInfoCache(max_age=60, maxsize=100))
+
+
+def make_update(user_id: int, replies: list, text: str = None):
+    async def answer():
+        pass
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    message = SimpleNamespace(text=text, reply_text=reply_text)
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id),
+        callback_query=SimpleNamespace(answer=answer, message=message),
+        message=message,
+    )
+
+
+async def press(data: str, user_data: dict, user_id: int = 3) -> tuple:
+    """Run buy_order for a press of the button with the given callback data, returning (state, replies)."""
+    replies = []
+    context = SimpleNamespace(args=list(callbacks.parse(data)[1]), user_data=user_data)
+    return await handlers.buy_order(make_update(user_id, replies), context), replies
+
+
+def test_notification_buy_button_brings_its_pair(fake_backend):
+    order = {
+        "order_id": 1, "from_currency": "BTC", "to_currency": "USDT", "amount_sold": 1, "amount_to_receive": 30000,
+        "status": "open",
+    }
+    _, keyboard = render_notification(("BTC", "USDT"), [order])
+    user_data = {"buy_currency": "ETH", "sell_currency": "BTC"}
+
+    async def main():
+        async with fake_backend(with_orders=True):
+            return await press(keyboard.inline_keyboard[0][0].callback_data, user_data)
+
+    state, _ = asyncio.run(main())
+    assert state == handlers.AMOUNT_TO_BUY
+    assert user_data == {
+        "order_id": 1, "buy_currency": "BTC", "sell_currency": "USDT", "order_rate": 30000, "order_seller": None,
+    }
+
+
+def test_buy_button_without_a_known_pair_ends_the_conversation():
+    user_data = {}
+
+    state, replies = asyncio.run(press(callbacks.encode(callbacks.BUY_ORDER, 7), user_data))
+
+    assert state == ConversationHandler.END
+    assert "no longer available" in replies[0]
+
+
+def test_funds_are_checked_after_the_order_book_snapshot_expired(monkeypatch, fake_backend):
+    monkeypatch.setattr(handlers, "order_books", OrderBookCache(max_age=0.05, maxsize=100))
+    user_data = {"buy_currency": "BTC", "sell_currency": "USDT"}
+
+    async def main():
+        async with fake_backend(with_orders=True):
+            await handlers.user_infos.get(3)
+            await handlers.fetch_buy_orders(SimpleNamespace(user_data=user_data), 3)
+            await press(callbacks.encode(callbacks.BUY_ORDER, 2, "BTC", "USDT"), user_data)
+            # The user takes a while to type the amount
+            await asyncio.sleep(0.1)
+            replies = []
+            context = SimpleNamespace(user_data=user_data)
+            state = await handlers.process_amount_to_buy(make_update(3, replies, "10"), context)
+            return state, replies
+
+    state, replies = asyncio.run(main())
+    assert state == handlers.AMOUNT_TO_BUY
+    assert "costs 310000.0 USDT" in replies[0]
+
+
+def test_failed_background_operation_replaces_the_processing_message():
+    edits = []
+
+    async def edit_text(text, **kwargs):
+        edits.append(text)
+
+    async def work():
+        raise KeyError("msg")
+
+    asyncio.run(handlers.edit_when_done(SimpleNamespace(edit_text=edit_text), work()))
+
+    assert len(edits) == 1 and edits[0].startswith("❌")
+
+
+def test_selecting_orders_fetches_the_list_once(monkeypatch, fake_backend):
+    monkeypatch.setattr(batch, "_unsupported", set())
+    user_data, edits = {}, []
+
+    async def answer():
+        pass
+
+    async def edit_message_text(text, **kwargs):
+        edits.append(text)
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=1),
+        callback_query=SimpleNamespace(answer=answer, edit_message_text=edit_message_text),
+    )
+
+    async def main():
+        async with fake_backend(with_orders=True) as fake:
+            order_ids = [fake.add_order(1, "ETH", "USDT", 1, 2000) for _ in range(2)]
+            await handlers.select_orders(update, SimpleNamespace(args=[], user_data=user_data))
+            for order_id in order_ids:
+                await handlers.toggle_order(update, SimpleNamespace(args=[order_id], user_data=user_data))
+            fetched_while_selecting = fake.requests[("GET", "/user/orders")]
+            await handlers.bulk_delete_orders(update, SimpleNamespace(args=[], user_data=user_data))
+            return order_ids, fetched_while_selecting, fake.requests[("GET", "/user/orders")]
+
+    order_ids, fetched_while_selecting, fetched = asyncio.run(main())
+    assert fetched_while_selecting == 1
+    # The list after the bulk delete is fetched afresh
+    assert fetched == 2
+    assert f"Deleted: #{order_ids[0]}, #{order_ids[1]}" in edits[-1]
+    assert "selectable_orders" not in user_data
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from orderbook import OrderBookCache
+
+
+def run_against(fake_backend, scenario, **options):
+    async def main():
+        async with fake_backend(with_orders=True, **options) as fake:
+            return fake, await scenario(fake, OrderBookCache(max_age=60, maxsize=100))
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("expose_owner", [True, False])
+def test_viewers_never_see_their_own_orders(fake_backend, expose_owner):
+    async def scenario(fake, books: OrderBookCache):
+        return [
+            sorted(order["order_id"] for order in await books.get_for_user("BTC", "USDT", user_id))
+            for user_id in (1, 2, 3)
+        ]
+
+    _, visible = run_against(fake_backend, scenario, expose_owner=expose_owner)
+    assert visible == [[2], [1], [1, 2]]
+
+
+def test_snapshot_is_shared_when_orders_name_their_owner(fake_backend):
+    async def scenario(fake, books: OrderBookCache):
+        for user_id in (1, 2, 3):
+            await books.get_for_user("BTC", "USDT", user_id)
+
+    fake, _ = run_against(fake_backend, scenario, expose_owner=True)
+    assert fake.requests[("GET", "/orders/list")] == 1
+
+
+def test_without_owners_the_shared_snapshot_is_only_fetched_once(fake_backend):
+    async def scenario(fake, books: OrderBookCache):
+        for user_id in (1, 2, 3):
+            await books.get_for_user("BTC", "USDT", user_id)
+        fake.add_order(3, "ETH", "USDT", 1, 2000)
+        for user_id in (1, 2, 3):
+            await books.get_for_user("ETH", "USDT", user_id)
+
+    fake, _ = run_against(fake_backend, scenario, expose_owner=False)
+    # One shared fetch finds out orders don't name their owner, then one per viewer and pair
+    assert fake.requests[("GET", "/orders/list")] == 1 + 3 + 3
+
+
+def test_viewers_lists_are_fetched_when_the_backend_wants_a_user_id(fake_backend):
+    async def scenario(fake, books: OrderBookCache):
+        fake.inject("/orders/list", status=400)
+        return [
+            sorted(order["order_id"] for order in await books.get_for_user("BTC", "USDT", user_id))
+            for user_id in (1, 2, 3)
+        ]
+
+    fake, visible = run_against(fake_backend, scenario, expose_owner=True)
+    assert visible == [[2], [1], [1, 2]]
+    assert fake.requests[("GET", "/orders/list")] == 1 + 3
+
+
+def test_invalidating_a_pair_drops_per_viewer_lists(fake_backend):
+    async def scenario(fake, books: OrderBookCache):
+        await books.get_for_user("BTC", "USDT", 3)
+        fake.add_order(1, "BTC", "USDT", 3, 32000)
+        books.invalidate("BTC", "USDT")
+        return len(await books.get_for_user("BTC", "USDT", 3))
+
+    _, visible = run_against(fake_backend, scenario, expose_owner=False)
+    assert visible == 3
@@ -0,0 +1,67 @@
+import asyncio
+import sqlite3
+import time
+
+from persistence import SQLitePersistence
+
+
+def test_user_data_refresh_does_not_wait_for_a_blocked_writer(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+
+    async def main():
+        ours, other_instance = SQLitePersistence(path), SQLitePersistence(path)
+        await asyncio.to_thread(other_instance._write, {1: {"from_currency": "BTC"}}, {}, None)
+
+        # A third connection holds the write lock, so our writer thread sits in BEGIN IMMEDIATE
+        blocker = sqlite3.connect(path, isolation_level=None)
+        blocker.execute("BEGIN IMMEDIATE")
+        writing = asyncio.create_task(asyncio.to_thread(ours._write, {2: {"to_currency": "ETH"}}, {}, None))
+        await asyncio.sleep(0.1)
+
+        user_data = {}
+        started = time.perf_counter()
+        await ours.refresh_user_data(1, user_data)
+        elapsed = time.perf_counter() - started
+
+        blocker.execute("COMMIT")
+        await writing
+        await ours.flush()
+        await other_instance.flush()
+        return user_data, elapsed
+
+    user_data, elapsed = asyncio.run(main())
+    assert user_data == {"from_currency": "BTC"}
+    assert elapsed < 0.05
+
+
+def test_processes_sharing_the_database_merge_their_registries(tmp_path):
+    path = str(tmp_path / "state.sqlite")
+
+    async def main():
+        first, second = SQLitePersistence(path, write_delay=0), SQLitePersistence(path, write_delay=0)
+        first_data, second_data = await first.get_bot_data(), await second.get_bot_data()
+        first_data["subscriptions"][("BTC", "USDT")] = {1: None}
+        first_data["watched_users"].add(1)
+        second_data["subscriptions"][("BTC", "USDT")] = {2: 30000.0}
+        second_data["watched_users"].add(2)
+
+        await first.update_bot_data(first_data)
+        await first._write_pending()
+        # The second process hasn't written its changes yet; a refresh keeps them
+        await second.refresh_bot_data(second_data)
+        refreshed = {pair: dict(subscribers) for pair, subscribers in second_data["subscriptions"].items()}
+
+        second_data["watched_users"].discard(1)
+        await second.update_bot_data(second_data)
+        await first.flush()
+        await second.flush()
+
+        reopened = SQLitePersistence(path)
+        loaded = await reopened.get_bot_data()
+        await reopened.flush()
+        return refreshed, loaded
+
+    refreshed, loaded = asyncio.run(main())
+    assert refreshed == {("BTC", "USDT"): {1: None, 2: 30000.0}}
+    assert loaded["subscriptions"] == {("BTC", "USDT"): {1: None, 2: 30000.0}}
+    assert loaded["watched_users"] == {2}
@@ -0,0 +1,117 @@
+import asyncio
+import datetime
+import time
+from collections import defaultdict, deque
+
+from telegram.error import RetryAfter
+
+from scheduler import BULK, OutboundScheduler
+
+
+class SimulatedTelegram:
+    """Bot API stand-in enforcing flood limits over sliding one-second windows, like Telegram's 429s."""
+
+    def __init__(self, global_limit: int, chat_limit: int, latency: float = 0.005):
+        self.global_limit = global_limit
+        self.chat_limit = chat_limit
+        self.latency = latency
+        self.sent = []
+        self.flood_errors = 0
+        self.forced_flood_waits = defaultdict(int)
+        self._recent = defaultdict(deque)
+
+    def call(self, data: dict):
+        async def callback():
+            chat_id = data["chat_id"]
+            now = time.monotonic()
+            if self.forced_flood_waits[chat_id]:
+                self.forced_flood_waits[chat_id] -= 1
+                self.flood_errors += 1
+                raise RetryAfter(datetime.timedelta(seconds=0.2))
+            for key, limit in (("global", self.global_limit), (chat_id, self.chat_limit)):
+                recent = self._recent[key]
+                while recent and recent[0] <= now - 1:
+                    recent.popleft()
+                if len(recent) >= limit:
+                    self.flood_errors += 1
+                    raise RetryAfter(datetime.timedelta(seconds=1))
+            self._recent["global"].append(now)
+            self._recent[chat_id].append(now)
+            self.sent.append((now, dict(data)))
+            await asyncio.sleep(self.latency)
+            return True
+        return callback
+
+
+async def send_all(telegram: SimulatedTelegram, scheduler: OutboundScheduler, messages: list) -> list:
+    async def send(data: dict, priority: int):
+        return await scheduler.process_request(
+            telegram.call(data), (), {}, "sendMessage", data, {"priority": priority}
+        )
+
+    try:
+        return await asyncio.gather(*(send(data, priority) for data, priority in messages), return_exceptions=True)
+    finally:
+        await scheduler.shutdown()
+
+
+def menu_messages(chats: int, per_chat: int) -> list:
+    # Messages with a keyboard can't be merged, so every one is a separate call
+    return [
+        ({"chat_id": chat_id, "text": f"message {n}", "reply_markup": "{}"}, BULK if n % 2 else 0)
+        for n in range(per_chat) for chat_id in range(1, chats + 1)
+    ]
+
+
+def test_sustained_throughput_stays_near_the_limits_without_flood_errors():
+    # Telegram's limits, ten times faster, so the test runs in about two seconds
+    telegram = SimulatedTelegram(global_limit=300, chat_limit=10)
+    scheduler = OutboundScheduler(overall_rate=270, chat_rate=9, chat_burst=1, group_rate=2, max_retries=0)
+    messages = menu_messages(chats=20, per_chat=9)
+
+    started = time.monotonic()
+    results = asyncio.run(send_all(telegram, scheduler, messages))
+    elapsed = time.monotonic() - started
+
+    assert results == [True] * len(messages)
+    assert telegram.flood_errors == 0
+    # Each chat's nine messages take eight intervals of 1/9 s, so the chats' rate is the bottleneck
+    assert len(messages) / elapsed > 0.8 * len(messages) / (8 / 9)
+
+
+def test_global_rate_is_held_across_many_chats():
+    telegram = SimulatedTelegram(global_limit=100, chat_limit=10)
+    scheduler = OutboundScheduler(overall_rate=90, chat_rate=9, chat_burst=1, group_rate=2, max_retries=0)
+    messages = menu_messages(chats=90, per_chat=2)
+
+    started = time.monotonic()
+    results = asyncio.run(send_all(telegram, scheduler, messages))
+    elapsed = time.monotonic() - started
+
+    assert results == [True] * len(messages)
+    assert telegram.flood_errors == 0
+    assert len(messages) / elapsed > 0.8 * 90
+
+
+def test_flood_waits_are_honoured_and_retried():
+    telegram = SimulatedTelegram(global_limit=300, chat_limit=10)
+    telegram.forced_flood_waits[1] = 1
+    scheduler = OutboundScheduler(overall_rate=270, chat_rate=9, chat_burst=1, group_rate=2, max_retries=3)
+
+    results = asyncio.run(send_all(telegram, scheduler, menu_messages(chats=5, per_chat=3)))
+
+    assert results == [True] * 15
+    assert telegram.flood_errors == 1
+    first_retry = min(sent_at for sent_at, data in telegram.sent if data["chat_id"] == 1)
+    assert first_retry - telegram.sent[0][0] >= 0.2
+
+
+def test_plain_texts_queued_for_a_chat_are_merged():
+    telegram = SimulatedTelegram(global_limit=300, chat_limit=10)
+    scheduler = OutboundScheduler(overall_rate=270, chat_rate=9, chat_burst=1, group_rate=2, max_retries=0)
+    messages = [({"chat_id": 1, "text": f"order {n}"}, BULK) for n in range(5)]
+
+    results = asyncio.run(send_all(telegram, scheduler, messages))
+
+    assert results == [True] * 5
+    assert [data["text"] for _, data in telegram.sent] == ["\n\n".join(f"order {n}" for n in range(5))]
@@ -0,0 +1,39 @@
+import asyncio
+from types import SimpleNamespace
+
+import callbacks
+import sharding
+import subscriptions
+from bench.updates import callback_update, command_update, message_update
+
+
+def test_updates_go_to_their_users_shard():
+    assert sharding.shard_of(message_update(1, 7, "BTC"), 4) == 3
+    assert sharding.shard_of(command_update(2, 7, "/start"), 4) == 3
+    assert sharding.shard_of(callback_update(3, 7, callbacks.encode(callbacks.BUY_ORDER, 5, "BTC", "USDT")), 4) == 3
+
+
+def test_subscription_changes_go_to_the_leader():
+    updates = [
+        command_update(1, 7, "/subscribe BTC USDT"),
+        command_update(2, 7, "/unsubscribe@fake_bot"),
+        callback_update(3, 7, callbacks.encode(callbacks.SUBSCRIBE_PAIR, "BTC", "USDT")),
+        callback_update(4, 7, callbacks.encode(callbacks.UNSUBSCRIBE_PAIR, "BTC", "USDT")),
+    ]
+
+    assert [sharding.shard_of(update, 4) for update in updates] == [sharding.LEADER] * 4
+
+
+def test_notify_me_button_brings_its_pair():
+    # The leader has none of the user's conversation state
+    bot_data, answers = {}, []
+
+    async def answer(text):
+        answers.append(text)
+
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=7), callback_query=SimpleNamespace(answer=answer))
+    context = SimpleNamespace(args=["BTC", "USDT"], user_data={}, bot_data=bot_data)
+    asyncio.run(subscriptions.subscribe_pair(update, context))
+
+    assert subscriptions.get_subscriptions(context) == {("BTC", "USDT"): {7: None}}
+    assert "notified" in answers[0]
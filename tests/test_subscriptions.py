@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import subscriptions
+from orderbook import OrderBookCache
+from watcher import OrderWatcher
+
+
+@pytest.fixture(autouse=True)
+def fresh_subscriptions(monkeypatch):
+    monkeypatch.setattr(subscriptions, "_last_seen", {})
+    monkeypatch.setattr(subscriptions, "order_books", OrderBookCache(max_age=0.05, maxsize=100))
+    monkeypatch.setattr(subscriptions, "order_watcher", OrderWatcher(max_orders=100, users_per_tick=10))
+
+
+def test_fan_out_never_asks_the_backend_per_subscriber(fake_backend):
+    subscribers = [1, *range(1000, 1199)]
+    sent = {}
+
+    async def send_message(chat_id, text, **kwargs):
+        sent[chat_id] = text
+
+    context = SimpleNamespace(
+        bot=SimpleNamespace(send_message=send_message),
+        bot_data={"subscriptions": {("BTC", "USDT"): dict.fromkeys(subscribers)}},
+    )
+
+    async def main():
+        async with fake_backend(with_orders=True, expose_owner=False) as fake:
+            # User 1 created orders through the bot, so the watcher knows them
+            subscriptions.order_watcher.watch(1)
+            await subscriptions.order_watcher.poll()
+            await subscriptions.poll_subscriptions(context)  # baseline
+
+            own = fake.add_order(1, "BTC", "USDT", 3, 29000)
+            other = fake.add_order(2, "BTC", "USDT", 4, 28000)
+            await subscriptions.order_watcher.poll()
+            await asyncio.sleep(0.1)
+            before = fake.requests[("GET", "/orders/list")]
+            await subscriptions.poll_subscriptions(context)
+            return own, other, fake.requests[("GET", "/orders/list")] - before
+
+    own, other, fetches = asyncio.run(main())
+    assert fetches == 1
+    assert set(sent) == set(subscribers)
+    assert f"Order ID: {own}\n" not in sent[1] and f"Order ID: {other}\n" in sent[1]
+    assert f"Order ID: {own}\n" in sent[1000] and f"Order ID: {other}\n" in sent[1000]
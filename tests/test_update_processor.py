@@ -0,0 +1,50 @@
+import asyncio
+import random
+import time
+
+from telegram import Update
+
+from bench.updates import message_update
+from update_processor import PerUserUpdateProcessor
+
+
+async def process_all(processor: PerUserUpdateProcessor, updates: list, handle) -> None:
+    # Like Application, start one task per update in arrival order
+    await asyncio.gather(*(
+        asyncio.create_task(processor.process_update(update, handle(update))) for update in updates
+    ))
+
+
+def test_updates_of_one_user_run_in_arrival_order():
+    processed = []
+
+    async def handle(update: Update) -> None:
+        await asyncio.sleep(random.uniform(0, 0.01))
+        processed.append((update.effective_user.id, update.update_id))
+
+    updates = [message_update(update_id, user_id=update_id % 3) for update_id in range(60)]
+    asyncio.run(process_all(PerUserUpdateProcessor(8), updates, handle))
+
+    for user_id in range(3):
+        own = [update_id for processed_user, update_id in processed if processed_user == user_id]
+        assert own == sorted(own) and len(own) == 20
+
+
+def test_backlog_of_one_user_does_not_hold_other_users_back():
+    finished = {}
+
+    async def handle(update: Update) -> None:
+        await asyncio.sleep(0.1)
+        finished[update.update_id] = time.perf_counter()
+
+    # User 1 queues ten slow updates before user 2's only update arrives
+    updates = [message_update(update_id, user_id=1) for update_id in range(10)] + [message_update(10, user_id=2)]
+
+    async def main():
+        started = time.perf_counter()
+        await process_all(PerUserUpdateProcessor(2), updates, handle)
+        return started
+
+    started = asyncio.run(main())
+    assert finished[10] - started < 0.3
+    assert max(finished.values()) - started >= 1.0
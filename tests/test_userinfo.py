@@ -0,0 +1,16 @@
+import asyncio
+
+from userinfo import UserInfoCache
+
+
+def test_balances_are_numbers_whatever_the_backend_sends(fake_backend):
+    async def main():
+        async with fake_backend() as fake:
+            fake.add_user(1, wallets={"BTC": 2, "USDT": "100.5", "ETH": "n/a"})
+
+            infos = UserInfoCache(max_age=60, maxsize=10)
+            await infos.get(1)
+
+        return [infos.balance(1, currency) for currency in ("BTC", "USDT", "ETH", "DOGE")]
+
+    assert asyncio.run(main()) == [2.0, 100.5, None, None]
@@ -0,0 +1,21 @@
+import pytest
+
+from validation import CurrencyTable, ValidationError
+
+
+def test_every_offered_currency_is_accepted():
+    table = CurrencyTable(["BTC", "USDT"])
+    table.learn(["BTC", "DOGE"])
+
+    assert table.choices() == ["BTC", "USDT"]
+    assert [table.parse(code) for code in table.choices()] == ["BTC", "USDT"]
+    with pytest.raises(ValidationError):
+        table.parse("DOGE")
+
+
+def test_wallet_currencies_are_offered_while_none_are_configured():
+    table = CurrencyTable([])
+    table.learn(["ETH", "BTC"])
+
+    assert table.choices() == ["BTC", "ETH"]
+    assert table.parse("DOGE") == "DOGE"
@@ -0,0 +1,35 @@
+import asyncio
+
+import backend
+import watcher
+from watcher import OrderWatcher
+
+
+def test_stale_fallback_does_not_count_as_a_poll(monkeypatch, fake_backend):
+    # Full listings every other poll and no margin, so a poll wrongly counted skips the fill below
+    monkeypatch.setattr(watcher, "_FULL_SYNC_EVERY", 2)
+    monkeypatch.setattr(watcher, "_SINCE_MARGIN", 0)
+
+    async def main():
+        async with fake_backend() as fake:
+            fake.add_user(1)
+            fake.add_user(2)
+            order_id = fake.add_order(1, "BTC", "USDT", 1, 30000)
+
+            orders = OrderWatcher(max_orders=100, users_per_tick=10)
+            orders.watch(1)
+            await orders.poll()  # baseline, a full listing
+            await orders.poll()  # changes since the baseline
+
+            # The backend goes down, so the next full listing is answered with the baseline's response
+            fake.inject("/user/orders", status=500, times=1 + backend.BACKEND_GET_RETRIES)
+            fake._fill(2, order_id, 1)
+            await asyncio.sleep(1.1)
+            during_outage = await orders.poll()
+            after_outage = await orders.poll()
+
+        return order_id, during_outage, after_outage
+
+    order_id, during_outage, after_outage = asyncio.run(main())
+    assert during_outage == []
+    assert after_outage == [(1, f"✅ Your order #{order_id} (BTC → USDT) has been filled.")]
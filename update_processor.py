@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+# Limit handed to BaseUpdateProcessor, whose slot is taken before the user's lock; the real one is taken after it
+_UNLIMITED = 2 ** 31
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Process updates from different users concurrently while keeping each user's updates in order.
+
+    An update first waits for the previous updates of its user and only then for one of the
+    ``max_concurrent_updates`` slots, so a user with a backlog occupies at most one slot.
+    Updates without an effective user (e.g. channel posts) are not serialized.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(_UNLIMITED)
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        # user_id -> [lock, number of updates holding or waiting for it]
+        self._user_locks = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user = update.effective_user if isinstance(update, Update) else None
+        if user is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        # The application starts one task per update in arrival order, and this runs before the
+        # task's first suspension (the unlimited outer slot never waits), so the lock's FIFO waiters
+        # keep a user's updates in arrival order
+        entry = self._user_locks.setdefault(user.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[user.id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._user_locks.clear()
@@ -0,0 +1,80 @@
+import backend
+from cache import TTLCache
+from utils import USER_INFO_MAX_AGE, USER_INFO_CACHE_SIZE
+from validation import currencies
+
+
+class UserInfoCache:
+    """Per-user /user/info payloads (address and wallets), kept for at most ``max_age`` seconds.
+
+    The bot's own order mutations keep entries current: purchases are patched into the buyer's
+    cached wallets, and mutations whose effect on balances can't be computed locally (creating
+    or deleting an order, selling to someone else) drop the affected user's entry.
+    """
+
+    def __init__(self, max_age: float, maxsize: int):
+        # user_id -> /user/info payload
+        self._info = TTLCache(maxsize=maxsize, ttl=max_age)
+
+    async def get(self, user_id: int):
+        """Return (payload, stale) for the user; payload is None if the backend failed.
+
+        stale is True when the backend was unavailable and served its last known answer, which
+        is shown but not cached.
+        """
+        info = self._info.get(user_id)
+        if info is not None:
+            return info, False
+
+        response = await backend.get("/user/info", params={"user_id": user_id})
+        if response.status_code != 200:
+            return None, False
+
+        info = response.json()
+        currencies.learn(wallet["currency"] for wallet in info["wallets"])
+        stale = backend.is_stale(response)
+        if not stale:
+            self._info.set(user_id, info)
+        return info, stale
+
+    def balance(self, user_id: int, currency: str):
+        """Return the user's cached balance in currency as a float, or None if it isn't cached or isn't a number."""
+        info = self._info.get(user_id)
+        if info is None:
+            return None
+        for wallet in info["wallets"]:
+            if wallet["currency"] == currency:
+                # The backend may send balances as strings
+                try:
+                    return float(wallet["value"])
+                except (TypeError, ValueError):
+                    return None
+        return None
+
+    def apply_purchase(self, user_id: int, bought_currency: str, amount_received: float, paid_currency: str,
+                       amount_paid: float) -> None:
+        """Patch a completed purchase into the buyer's cached wallets."""
+        info = self._info.get(user_id)
+        if info is None:
+            return
+
+        wallets = {wallet["currency"]: wallet for wallet in info["wallets"]}
+        bought, paid = wallets.get(bought_currency), wallets.get(paid_currency)
+        if bought is None or paid is None or not all(
+            isinstance(wallet["value"], (int, float)) for wallet in (bought, paid)
+        ):
+            # A wallet the backend has yet to create, or a balance format we can't do arithmetic on
+            self.invalidate(user_id)
+            return
+
+        bought["value"] += amount_received
+        paid["value"] -= amount_paid
+
+    def invalidate(self, user_id: int) -> None:
+        self._info.invalidate(user_id)
+
+    def stats(self) -> dict:
+        return self._info.stats()
+
+
+user_infos = UserInfoCache(max_age=USER_INFO_MAX_AGE, maxsize=USER_INFO_CACHE_SIZE)
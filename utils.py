@@ -9,3 +9,93 @@ load_dotenv()
 # API URL configuration
 API_URL = os.getenv("API_URL")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Base URL of the Bot API server (empty uses api.telegram.org)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
+
+# Backend HTTP client configuration
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "10"))
+BACKEND_MAX_CONNECTIONS = int(os.getenv("BACKEND_MAX_CONNECTIONS", "100"))
+BACKEND_MAX_KEEPALIVE = int(os.getenv("BACKEND_MAX_KEEPALIVE", "20"))
+BACKEND_MAX_CONCURRENCY = int(os.getenv("BACKEND_MAX_CONCURRENCY", "50"))
+
+# Worker processes that updates are sharded across by user id (1 runs everything in this process)
+SHARDS = int(os.getenv("SHARDS", "1"))
+
+# Maximum number of updates processed in parallel across users (0 processes updates one at a time)
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "0"))
+
+# User existence cache: positive answers are kept until evicted, negative ones for a short time
+USER_EXISTS_CACHE_SIZE = int(os.getenv("USER_EXISTS_CACHE_SIZE", "100000"))
+USER_EXISTS_NEGATIVE_TTL = float(os.getenv("USER_EXISTS_NEGATIVE_TTL", "30"))
+
+# Per-user /user/info cache: maximum staleness in seconds and number of users kept
+USER_INFO_MAX_AGE = float(os.getenv("USER_INFO_MAX_AGE", "60"))
+USER_INFO_CACHE_SIZE = int(os.getenv("USER_INFO_CACHE_SIZE", "10000"))
+
+# Input validation: supported currency codes (comma-separated; empty accepts any well-formed code), how often
+# to reload them from the backend in seconds, and decimal places allowed in amounts and rates
+SUPPORTED_CURRENCIES = [
+    code.strip().upper() for code in os.getenv("SUPPORTED_CURRENCIES", "").split(",") if code.strip()
+]
+CURRENCY_REFRESH_INTERVAL = float(os.getenv("CURRENCY_REFRESH_INTERVAL", "300"))
+AMOUNT_MAX_DECIMALS = int(os.getenv("AMOUNT_MAX_DECIMALS", "8"))
+
+# Number of orders shown per page in order lists
+ORDERS_PAGE_SIZE = int(os.getenv("ORDERS_PAGE_SIZE", "5"))
+
+# Shared order book snapshots: maximum staleness in seconds and number of currency pairs kept
+ORDER_BOOK_MAX_AGE = float(os.getenv("ORDER_BOOK_MAX_AGE", "5"))
+ORDER_BOOK_CACHE_SIZE = int(os.getenv("ORDER_BOOK_CACHE_SIZE", "1000"))
+
+# SQLite file for conversation and user_data persistence (empty keeps state in memory only)
+PERSISTENCE_PATH = os.getenv("PERSISTENCE_PATH", "")
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv("PERSISTENCE_UPDATE_INTERVAL", "10"))
+PERSISTENCE_WRITE_DELAY = float(os.getenv("PERSISTENCE_WRITE_DELAY", "0.5"))
+
+# Webhook mode: set WEBHOOK_URL to the public URL Telegram should POST updates to (empty uses polling)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Several instances behind a load balancer: set to 0 on all but one, so subscriptions and order fills are polled
+# and notified once. They must share its PERSISTENCE_PATH, through which it sees their subscriptions and watches
+RUN_SHARED_JOBS = os.getenv("RUN_SHARED_JOBS", "1") == "1"
+
+# Metrics: samples kept per histogram for quantiles, HTTP endpoint (port 0 disables it) and log dump interval
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "0"))
+
+# Outbound Bot API rate limits (Telegram allows about 30 messages/s overall, 1/s per chat and 20/min per group)
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(20 / 60)))
+TELEGRAM_MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", "3"))
+
+# Backend resilience: retries of GETs and deduplicated mutations, load-shedding budget, circuit breaker and last-known-good responses
+BACKEND_GET_RETRIES = int(os.getenv("BACKEND_GET_RETRIES", "2"))
+BACKEND_RETRY_BACKOFF = float(os.getenv("BACKEND_RETRY_BACKOFF", "0.2"))
+BACKEND_MAX_IN_FLIGHT = int(os.getenv("BACKEND_MAX_IN_FLIGHT", "200"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+BACKEND_STALE_CACHE_SIZE = int(os.getenv("BACKEND_STALE_CACHE_SIZE", "10000"))
+BACKEND_STALE_TTL = float(os.getenv("BACKEND_STALE_TTL", "600"))
+# Set to 1 only if the backend applies requests repeating an Idempotency-Key once; then mutations are retried too
+BACKEND_DEDUPES_IDEMPOTENCY_KEYS = os.getenv("BACKEND_DEDUPES_IDEMPOTENCY_KEYS", "0") == "1"
+
+# Order book subscriptions: poll interval in seconds, per-user limit and notifications sent concurrently
+SUBSCRIPTION_POLL_INTERVAL = float(os.getenv("SUBSCRIPTION_POLL_INTERVAL", "10"))
+MAX_SUBSCRIPTIONS_PER_USER = int(os.getenv("MAX_SUBSCRIPTIONS_PER_USER", "10"))
+SUBSCRIPTION_FANOUT_BATCH = int(os.getenv("SUBSCRIPTION_FANOUT_BATCH", "100"))
+
+# Order fill tracking: poll interval in seconds, users polled per interval and open orders kept in memory
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "5"))
+WATCH_USERS_PER_TICK = int(os.getenv("WATCH_USERS_PER_TICK", "50"))
+WATCH_MAX_ORDERS = int(os.getenv("WATCH_MAX_ORDERS", "100000"))
+
+# Optimistic UI: acknowledge order mutations at once and edit in the outcome when the backend has answered
+OPTIMISTIC_UI = os.getenv("OPTIMISTIC_UI", "0") == "1"
@@ -0,0 +1,112 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+from telegram.ext import ContextTypes
+
+import backend
+from utils import SUPPORTED_CURRENCIES, AMOUNT_MAX_DECIMALS
+
+# Currency codes look like BTC, USDT or 1INCH
+_CURRENCY_FORMAT = re.compile(r"^[A-Z0-9]{2,10}$")
+
+# Amounts are sent to the backend as JSON floats, which hold about 15 significant digits exactly
+_MAX_SIGNIFICANT_DIGITS = 15
+
+# Status codes meaning the backend has no currency list endpoint
+_MISSING_ENDPOINT_STATUSES = {404, 405, 501}
+
+
+class ValidationError(ValueError):
+    """Invalid user input; the message is meant to be shown to the user as is."""
+
+
+class CurrencyTable:
+    """Currencies the bot accepts, checked locally before any backend call.
+
+    The supported set is SUPPORTED_CURRENCIES plus whatever the backend's /currencies endpoint
+    returns, if it has one; while both are empty any well-formed code is accepted. Currencies
+    seen in users' wallets are remembered too, so they can be offered as choice buttons while
+    the supported set is empty.
+    """
+
+    def __init__(self, configured: list):
+        self._configured = set(configured)
+        self._fetched = set()
+        self._seen = set()
+        self._endpoint_missing = False
+
+    def supported(self) -> set:
+        return self._configured | self._fetched
+
+    def fetched(self) -> list:
+        """Codes the last refresh got from the backend."""
+        return sorted(self._fetched)
+
+    def set_fetched(self, codes) -> None:
+        """Take over the codes another process fetched, see sharding.refresh_currencies."""
+        self._fetched = set(codes)
+
+    def choices(self) -> list:
+        """Codes to offer as choice buttons: the supported ones, or while none are known, those seen in wallets."""
+        return sorted(self.supported() or self._seen)
+
+    def learn(self, codes) -> None:
+        """Remember currency codes seen in backend responses."""
+        self._seen.update(code for code in map(str, codes) if _CURRENCY_FORMAT.match(code))
+
+    async def refresh(self) -> None:
+        """Reload the supported set from the backend's /currencies endpoint."""
+        if self._endpoint_missing:
+            return
+
+        response = await backend.get("/currencies")
+        if response.status_code in _MISSING_ENDPOINT_STATUSES:
+            self._endpoint_missing = True
+        elif response.status_code == 200 and not backend.is_stale(response):
+            # Accept both ["BTC", ...] and [{"currency": "BTC"}, ...]
+            self._fetched = {
+                str(item["currency"] if isinstance(item, dict) else item).upper() for item in response.json()
+            }
+
+    def parse(self, text: str) -> str:
+        """Return the normalized currency code for the user's input, or raise ValidationError."""
+        code = text.strip().upper()
+        if not _CURRENCY_FORMAT.match(code):
+            raise ValidationError(f"'{text.strip()}' is not a currency code. Please enter a code such as BTC.")
+
+        supported = self.supported()
+        if supported and code not in supported:
+            raise ValidationError(f"{code} is not supported. Please choose one of: {', '.join(sorted(supported))}.")
+        return code
+
+
+currencies = CurrencyTable(SUPPORTED_CURRENCIES)
+
+
+def parse_amount(text: str, max_decimals: int = AMOUNT_MAX_DECIMALS) -> float:
+    """Parse a positive amount or rate typed by the user, or raise ValidationError."""
+    try:
+        value = Decimal(text.strip().replace(",", "."))
+    except InvalidOperation:
+        raise ValidationError("Please enter a number, e.g. 0.5.") from None
+
+    if not value.is_finite() or value <= 0:
+        raise ValidationError("Please enter a number greater than zero.")
+
+    sign, digits, exponent = value.normalize().as_tuple()
+    if -exponent > max_decimals:
+        raise ValidationError(f"Please use at most {max_decimals} decimal places.")
+    if len(digits) + max(exponent, 0) > _MAX_SIGNIFICANT_DIGITS:
+        raise ValidationError(f"Please use at most {_MAX_SIGNIFICANT_DIGITS} digits.")
+    return float(value)
+
+
+def check_pair(first: str, second: str) -> None:
+    """Reject a pair whose two currencies are the same."""
+    if first == second:
+        raise ValidationError(f"Please choose a currency other than {first}.")
+
+
+async def refresh_currencies(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Job: reload the supported currencies from the backend."""
+    await currencies.refresh()
@@ -0,0 +1,190 @@
+import asyncio
+import time
+from collections import deque
+
+from telegram.error import Forbidden
+from telegram.ext import ContextTypes
+
+import backend
+import metrics
+from scheduler import BULK
+from userinfo import user_infos
+from utils import WATCH_MAX_ORDERS, WATCH_USERS_PER_TICK
+
+# Order statuses (compared case-insensitively) after which an order can no longer change
+FILLED_STATUSES = {"filled", "completed", "executed", "closed"}
+FINAL_STATUSES = FILLED_STATUSES | {"cancelled", "canceled", "deleted"}
+
+# Seconds subtracted from the last poll time when asking for changes, to absorb clock skew
+_SINCE_MARGIN = 5
+# Every this many polls of a user fetch all their orders, to drop orders removed outside the bot
+_FULL_SYNC_EVERY = 20
+
+
+class OrderWatcher:
+    """Track the open orders of users who created orders through the bot and report fills to them.
+
+    The index holds one (status, amount_sold) tuple per open order. Users are polled round-robin,
+    at most ``users_per_tick`` per tick, asking /user/orders only for orders updated since that
+    user's previous poll, with a periodic full fetch to notice orders that disappeared. The first
+    poll of a user records a baseline without notifying, and a user is dropped once none of their
+    orders are open. When the index exceeds ``max_orders`` the users watched the longest are evicted.
+    """
+
+    def __init__(self, max_orders: int, users_per_tick: int):
+        self.max_orders = max_orders
+        self.users_per_tick = users_per_tick
+        self.order_count = 0
+        # user_id -> {order_id: (status, amount_sold)}, or None until the baseline poll; insertion order = age
+        self._orders = {}
+        # user_id -> (wall-clock time of the last successful poll, number of successful polls)
+        self._polled_at = {}
+        self._queue = deque()
+        # Users forgotten since the last call to take_dropped()
+        self._dropped = set()
+
+    def watch(self, user_id: int) -> None:
+        self._dropped.discard(user_id)
+        if user_id not in self._orders:
+            self._orders[user_id] = None
+            self._queue.appendleft(user_id)
+
+    def forget(self, user_id: int) -> None:
+        orders = self._orders.pop(user_id, None)
+        if orders:
+            self.order_count -= len(orders)
+        self._polled_at.pop(user_id, None)
+        self._dropped.add(user_id)
+
+    def forget_order(self, user_id: int, order_id: int) -> None:
+        orders = self._orders.get(user_id)
+        if orders and orders.pop(order_id, None) is not None:
+            self.order_count -= 1
+
+    def users(self) -> set:
+        return set(self._orders)
+
+    def order_ids(self, user_id: int) -> set:
+        """Ids of the user's open orders in the index, as of their last poll."""
+        return set(self._orders.get(user_id) or ())
+
+    def take_dropped(self) -> set:
+        dropped, self._dropped = self._dropped, set()
+        return dropped
+
+    async def poll(self) -> list:
+        """Poll the next batch of users, returning (user_id, message) notifications for detected fills."""
+        batch = []
+        while self._queue and len(batch) < self.users_per_tick:
+            user_id = self._queue.popleft()
+            if user_id in self._orders and user_id not in batch:
+                batch.append(user_id)
+
+        started_at = time.time()
+        full = {user_id: self._needs_full_sync(user_id) for user_id in batch}
+        responses = await asyncio.gather(*(self._fetch(user_id, full[user_id]) for user_id in batch))
+
+        notifications = []
+        for user_id, response in zip(batch, responses):
+            if user_id not in self._orders:
+                continue
+            # A stale fallback holds no news, and counting it would skip changes made since the last real poll
+            if response.status_code == 200 and not backend.is_stale(response):
+                polls = self._polled_at.get(user_id, (0, 0))[1]
+                self._polled_at[user_id] = (started_at, polls + 1)
+                messages = self._update(user_id, response.json(), full[user_id])
+                notifications.extend((user_id, message) for message in messages)
+            if user_id in self._orders:
+                self._queue.append(user_id)
+
+        self._evict()
+        return notifications
+
+    def _needs_full_sync(self, user_id: int) -> bool:
+        if self._orders.get(user_id) is None or user_id not in self._polled_at:
+            return True
+        return self._polled_at[user_id][1] % _FULL_SYNC_EVERY == 0
+
+    async def _fetch(self, user_id: int, full: bool):
+        params = {"user_id": user_id}
+        if not full:
+            params["updated_since"] = int(self._polled_at[user_id][0] - _SINCE_MARGIN)
+        return await backend.get("/user/orders", params=params)
+
+    def _update(self, user_id: int, orders: list, full: bool) -> list:
+        """Merge fetched orders into the index and describe the fills found."""
+        known = self._orders[user_id]
+        baseline = known is None
+        if baseline:
+            known = self._orders[user_id] = {}
+        elif full:
+            # Orders missing from a full listing were removed without going through the bot
+            returned = {order["order_id"] for order in orders}
+            for order_id in [order_id for order_id in known if order_id not in returned]:
+                del known[order_id]
+                self.order_count -= 1
+
+        messages = []
+        for order in orders:
+            order_id = order["order_id"]
+            status = str(order["status"])
+            amount_sold = order["amount_sold"]
+            previous = known.get(order_id)
+
+            if not baseline and previous is not None and previous != (status, amount_sold):
+                pair = f"{order['from_currency']} → {order['to_currency']}"
+                if status.lower() in FILLED_STATUSES:
+                    messages.append(f"✅ Your order #{order_id} ({pair}) has been filled.")
+                elif amount_sold < previous[1]:
+                    messages.append(
+                        f"🔸 Your order #{order_id} ({pair}) was partially filled: "
+                        f"{amount_sold} of {previous[1]} still on sale."
+                    )
+                elif status != previous[0]:
+                    messages.append(f"ℹ️ Your order #{order_id} ({pair}) is now {status}.")
+
+            if status.lower() in FINAL_STATUSES:
+                if known.pop(order_id, None) is not None:
+                    self.order_count -= 1
+            else:
+                if previous is None:
+                    self.order_count += 1
+                known[order_id] = (status, amount_sold)
+
+        if not known:
+            self.forget(user_id)
+        return messages
+
+    def _evict(self) -> None:
+        while self.order_count > self.max_orders and self._orders:
+            self.forget(next(iter(self._orders)))
+            metrics.increment("order_watcher_evictions_total")
+
+
+order_watcher = OrderWatcher(max_orders=WATCH_MAX_ORDERS, users_per_tick=WATCH_USERS_PER_TICK)
+
+
+async def poll_order_status(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Job: poll the next batch of watched users and notify owners whose orders were filled."""
+    # bot_data holds the watched users so the watch list survives restarts when persistence is on
+    watched = context.bot_data.setdefault("watched_users", set())
+    for user_id in watched - order_watcher.users():
+        order_watcher.watch(user_id)
+
+    notifications = await order_watcher.poll()
+    watched.difference_update(order_watcher.take_dropped())
+    # A fill changes the seller's balances
+    for user_id, _ in notifications:
+        user_infos.invalidate(user_id)
+
+    await asyncio.gather(*(_notify(context, user_id, message) for user_id, message in notifications))
+
+
+async def _notify(context: ContextTypes.DEFAULT_TYPE, user_id: int, message: str) -> None:
+    try:
+        await context.bot.send_message(chat_id=user_id, text=message, rate_limit_args={"priority": BULK})
+        metrics.increment("order_fill_notifications_total")
+    except Forbidden:
+        pass
+    except Exception as e:
+        print(f"Failed to notify {user_id} about an order update: {e}")